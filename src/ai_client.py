@@ -1,9 +1,130 @@
 """AI API client for OpenAI-compatible chat completion endpoints."""
 
+import copy
+import gzip
+import hashlib
 import json
+import random
+import re
+import threading
 import time
+from collections import OrderedDict
 
 import requests
+from requests.adapters import HTTPAdapter
+
+# orjson (Rust implementation, SIMD-accelerated parsing) is used when
+# available; stdlib json is the fallback so the dependency stays optional.
+try:
+    import orjson
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+
+    def _json_loads(data):
+        return orjson.loads(data)
+
+except ImportError:
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj).encode("utf-8")
+
+    def _json_loads(data):
+        return json.loads(data)
+
+
+# Request bodies above this size are gzip-compressed before sending
+_GZIP_THRESHOLD_BYTES = 4096
+
+# Markdown code-fence wrapper around an AI response, e.g. ```json … ```
+_FENCE_RE = re.compile(r"\A\s*```(?:json|JSON)?[ \t]*\n(.*?)\n```\s*\Z", re.DOTALL)
+
+
+def _extract_first_json_obj(data: bytes) -> bytes | None:
+    """Return the first balanced top-level JSON object in *data*, or None.
+
+    Single left-to-right scan tracking string/escape state, so braces
+    inside string literals can't unbalance the depth count the way a
+    naive find("{")/rfind("}") slice can.
+    """
+    depth = 0
+    start = -1
+    in_string = False
+    escape = False
+
+    for i, byte in enumerate(data):
+        if in_string:
+            if escape:
+                escape = False
+            elif byte == 0x5C:  # backslash
+                escape = True
+            elif byte == 0x22:  # closing quote
+                in_string = False
+        elif byte == 0x22 and depth:  # quote inside an object
+            in_string = True
+        elif byte == 0x7B:  # {
+            if depth == 0:
+                start = i
+            depth += 1
+        elif byte == 0x7D and depth:  # }
+            depth -= 1
+            if depth == 0:
+                return data[start : i + 1]
+
+    return None
+
+
+class _TokenBucket:
+    """Token-bucket admission control shared by all workers.
+
+    Refills at ``rate_per_s`` tokens per second up to ``burst``.
+    ``acquire()`` blocks until a token is available, so concurrent
+    callers are admitted at a fair rate instead of each sleeping
+    independently. A rate of 0 means unlimited (penalties still apply).
+    """
+
+    def __init__(self, rate_per_s: float = 0.0, burst: float = 1.0):
+        self._lock = threading.Lock()
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._penalty_until = 0.0
+
+    def acquire(self, cost: float = 1.0) -> float:
+        """Block until *cost* tokens are available. Returns seconds waited.
+
+        A cost larger than the burst is clamped to it, so a single
+        oversized request waits for a full bucket instead of forever.
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if self.rate_per_s > 0:
+                    self._tokens = min(
+                        self.burst,
+                        self._tokens + (now - self._last_refill) * self.rate_per_s,
+                    )
+                self._last_refill = now
+                wait = self._penalty_until - now
+                if wait <= 0:
+                    if self.rate_per_s <= 0:
+                        return waited
+                    need = min(cost, self.burst)
+                    if self._tokens >= need:
+                        self._tokens -= need
+                        return waited
+                    wait = (need - self._tokens) / self.rate_per_s
+            time.sleep(wait)
+            waited += wait
+
+    def penalize(self, seconds: float):
+        """Suspend admissions for *seconds* (e.g. from a Retry-After hint)."""
+        with self._lock:
+            self._penalty_until = max(
+                self._penalty_until, time.monotonic() + seconds
+            )
 
 
 class AIClient:
@@ -13,6 +134,7 @@ class AIClient:
     Ollama, vLLM, LiteLLM, etc.).
 
     Includes:
+    - Persistent keep-alive connection (one TLS handshake per host, not per call)
     - Configurable base delay between calls (``request_delay_ms``)
     - Adaptive throttle: on 429 the delay auto-ramps and decays over time
     """
@@ -26,6 +148,9 @@ class AIClient:
         timeout: int = 300,
         request_delay_ms: int = 0,
         temperature: float = 0.1,
+        max_body_bytes: int = 4 * 1024 * 1024,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
     ):
         self.api_key = api_key
         self.base_url = base_url.rstrip("/")
@@ -33,37 +158,148 @@ class AIClient:
         self.max_retries = max_retries
         self.timeout = timeout
         self.temperature = temperature
+        self.max_body_bytes = max_body_bytes
+
+        # --- Persistent HTTP session --------------------------------------
+        # Reuses keep-alive connections so repeated calls skip the TCP +
+        # TLS handshake; retries stay in our own loop below. HTTP/1.1
+        # serializes responses per connection, so the pool is sized to give
+        # every concurrent batch worker its own connection instead
+        # of queueing behind head-of-line blocking.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32, max_retries=0)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self._session.headers.update(
+            {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            }
+        )
+
+        # Request invariants — built once instead of per call
+        self._url = f"{self.base_url}/chat/completions"
+        self._payload_tmpl = {
+            "model": model,
+            "temperature": temperature,
+            "response_format": {"type": "json_object"},
+        }
+        # Serialized template with the closing brace swapped for a
+        # ,"messages": slot — per call the body is just this prefix, the
+        # encoded messages list, and a closing brace, instead of building
+        # and re-encoding the whole outer dict.
+        self._body_prefix = _json_dumps(self._payload_tmpl)[:-1] + b',"messages":'
+
+        # --- Result cache --------------------------------------------------
+        # Identical (system, user) pairs — retries, or the same file in two
+        # batches — skip the network round trip entirely.
+        self._result_cache: OrderedDict[bytes, dict] = OrderedDict()
+        self._result_cache_lock = threading.Lock()
+
+        # Cleared the first time a gzipped request draws a 4xx — the
+        # endpoint evidently doesn't decompress request bodies.
+        self._gzip_ok = True
 
         # --- Throttle state -----------------------------------------------
+        # One bucket shared by all concurrent analyze() callers: admissions are
+        # paced at the effective rate instead of each thread sleeping alone.
+        self._bucket = _TokenBucket()
+        # Optional hard caps from the provider's published limits (0 = off).
+        # The request bucket is paced by rate below; the token bucket is a
+        # second admission gate costed by each call's estimated prompt size.
+        self._rpm_rate = requests_per_minute / 60.0
+        self._token_bucket = (
+            _TokenBucket(rate_per_s=tokens_per_minute / 60.0, burst=float(tokens_per_minute))
+            if tokens_per_minute > 0
+            else None
+        )
         self._base_delay_s = request_delay_ms / 1000.0  # user-configured floor
         self._adaptive_delay_s = 0.0  # extra delay added on 429
         self._last_call_time = 0.0
         self._total_calls = 0
         self._total_throttle_s = 0.0
 
+        # --- Congestion signal (proactive admission control) --------------
+        # Smoothed 429 rate and Retry-After hint; their product is added
+        # to the pacing delay BEFORE the next call, so sustained pressure
+        # slows us down ahead of the next rejection instead of after it.
+        self._ewma_429_rate = 0.0
+        self._ewma_retry_after_s = 1.0
+        self._proactive_delays = 0
+
     # ------------------------------------------------------------------
     # Public
     # ------------------------------------------------------------------
 
-    def analyze(self, system_prompt: str, user_content: str) -> dict:
-        """Send an analysis request and return the parsed JSON response."""
+    _RESULT_CACHE_MAX = 256
+
+    def analyze(
+        self, system_prompt: str, user_content: str, estimated_tokens: int = 0
+    ) -> dict:
+        """Send an analysis request and return the parsed JSON response.
+
+        Identical requests within this client's lifetime are served from
+        an in-memory LRU cache instead of re-calling the API.
+        ``estimated_tokens`` costs the call against the tokens-per-minute
+        bucket when that limit is configured.
+        """
+        key = hashlib.blake2b(
+            system_prompt.encode() + b"\0" + user_content.encode(),
+            digest_size=16,
+        ).digest()
+
+        with self._result_cache_lock:
+            cached = self._result_cache.get(key)
+            if cached is not None:
+                self._result_cache.move_to_end(key)
+                # Copy: callers mutate findings (e.g. tagging the check)
+                return copy.deepcopy(cached)
+
         messages = [
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": user_content},
         ]
-        raw = self._chat_completion(messages)
-        return self._parse_json(raw)
+        raw = self._chat_completion(messages, estimated_tokens)
+        result = self._parse_json(raw)
+
+        with self._result_cache_lock:
+            self._result_cache[key] = copy.deepcopy(result)
+            while len(self._result_cache) > self._RESULT_CACHE_MAX:
+                self._result_cache.popitem(last=False)
+
+        return result
+
+    # Cached preflight verdicts — the answer ("does model X work for this
+    # key/endpoint?") is stable within a run, so repeated clients skip the
+    # extra HTTPS round trip. Keyed by (base_url, key-hash, model).
+    _preflight_cache: dict[tuple, tuple[float, dict]] = {}
+    _PREFLIGHT_TTL_S = 300
 
     def preflight(self) -> dict:
         """Quick smoke-test: verify API key, endpoint, and model availability.
 
         Returns a dict with 'ok' (bool), 'model' (str), and 'error' (str|None).
+        Successful verdicts are cached for a few minutes per
+        (base_url, api key, model) so repeated preflights in the same
+        process return without a network call.
         """
-        url = f"{self.base_url}/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
+        cache_key = (
+            self.base_url,
+            hashlib.sha256(self.api_key.encode()).hexdigest()[:16],
+            self.model,
+        )
+        cached = self._preflight_cache.get(cache_key)
+        if cached and time.monotonic() - cached[0] < self._PREFLIGHT_TTL_S:
+            return dict(cached[1])
+
+        result = self._preflight_probe()
+        if result["ok"] and not result["error"]:
+            self._preflight_cache[cache_key] = (time.monotonic(), dict(result))
+        return result
+
+    def _preflight_probe(self) -> dict:
+        """Perform the actual preflight round trip."""
+        url = self._url
         payload = {
             "model": self.model,
             "messages": [{"role": "user", "content": "Say OK"}],
@@ -72,7 +308,7 @@ class AIClient:
         }
 
         try:
-            resp = requests.post(url, headers=headers, json=payload, timeout=30)
+            resp = self._session.post(url, json=payload, timeout=30)
 
             if resp.status_code == 200:
                 return {"ok": True, "model": self.model, "error": None}
@@ -137,6 +373,16 @@ class AIClient:
                 "error": f"Cannot connect to {self.base_url} — {str(exc)[:200]}",
             }
 
+    def close(self):
+        """Release the underlying HTTP connection pool."""
+        self._session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
     @property
     def effective_delay_ms(self) -> int:
         """Current per-call delay (base + adaptive) in milliseconds."""
@@ -149,22 +395,72 @@ class AIClient:
             "total_calls": self._total_calls,
             "total_throttle_s": round(self._total_throttle_s, 1),
             "effective_delay_ms": self.effective_delay_ms,
+            "admission_denials_avoided": self._proactive_delays,
         }
 
     # ------------------------------------------------------------------
     # Internals
     # ------------------------------------------------------------------
 
-    def _throttle(self):
-        """Sleep enough to respect the configured + adaptive delay."""
-        delay = self._base_delay_s + self._adaptive_delay_s
-        if delay <= 0:
-            return
-        elapsed = time.monotonic() - self._last_call_time
-        remaining = delay - elapsed
-        if remaining > 0:
-            self._total_throttle_s += remaining
-            time.sleep(remaining)
+    # Smoothing factor for the congestion EWMAs
+    _EWMA_ALPHA = 0.2
+
+    def _throttle(self, estimated_tokens: int = 0):
+        """Wait for bucket admission at the configured + adaptive rate.
+
+        The congestion component (smoothed 429 rate x smoothed
+        Retry-After) tightens pacing proactively while the endpoint is
+        under pressure and fades out as successes accumulate. When
+        requests/tokens-per-minute limits are configured they act as hard
+        ceilings on top of the adaptive pacing.
+        """
+        congestion = self._ewma_429_rate * self._ewma_retry_after_s
+        if congestion > 0.05:
+            self._proactive_delays += 1
+        delay = self._base_delay_s + self._adaptive_delay_s + congestion
+        rate = (1.0 / delay) if delay > 0 else 0.0
+        if self._rpm_rate > 0:
+            rate = min(rate, self._rpm_rate) if rate > 0 else self._rpm_rate
+        self._bucket.rate_per_s = rate
+        self._total_throttle_s += self._bucket.acquire()
+        if self._token_bucket is not None and estimated_tokens > 0:
+            self._total_throttle_s += self._token_bucket.acquire(float(estimated_tokens))
+
+    def _observe_429(self, retry_after: float):
+        """Fold a rejection into the congestion signal."""
+        a = self._EWMA_ALPHA
+        self._ewma_429_rate += a * (1.0 - self._ewma_429_rate)
+        self._ewma_retry_after_s += a * (retry_after - self._ewma_retry_after_s)
+
+    def _observe_success(self):
+        """Fold a success into the congestion signal."""
+        self._ewma_429_rate *= 1.0 - self._EWMA_ALPHA
+
+    def _read_body(self, resp) -> bytes:
+        """Read a streamed response into a bounded buffer.
+
+        Aborts the connection and raises once ``max_body_bytes`` is
+        exceeded, so a runaway model response cannot balloon memory.
+        """
+        buf = bytearray()
+        for chunk in resp.iter_content(chunk_size=65536):
+            buf += chunk
+            if len(buf) > self.max_body_bytes:
+                resp.close()
+                raise RuntimeError(
+                    f"AI response exceeded {self.max_body_bytes // (1024 * 1024)} MiB "
+                    f"— aborting read. The model returned unexpectedly long output."
+                )
+        return bytes(buf)
+
+    @staticmethod
+    def _backoff(attempt: int, cap: float = 60.0) -> float:
+        """Exponential backoff with jitter: 2**attempt scaled by 0.5-1.5x.
+
+        The jitter spreads retries from concurrent workers so they do not
+        hammer the endpoint in lock-step (thundering herd).
+        """
+        return min(cap, (2 ** attempt) * random.uniform(0.5, 1.5))
 
     def _decay_adaptive_delay(self):
         """Slowly reduce the adaptive penalty after a successful call."""
@@ -180,62 +476,91 @@ class AIClient:
         )
         print(f"    Adaptive delay ramped to {self.effective_delay_ms}ms")
 
-    def _chat_completion(self, messages: list[dict]) -> str:
+    def _chat_completion(self, messages: list[dict], estimated_tokens: int = 0) -> str:
         """Call the chat/completions endpoint with retry, back-off & throttle."""
-        url = f"{self.base_url}/chat/completions"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-        payload = {
-            "model": self.model,
-            "messages": messages,
-            "temperature": self.temperature,
-            "response_format": {"type": "json_object"},
-        }
+        url = self._url
+
+        # Serialize once, outside the retry loop, splicing the encoded
+        # messages into the prebuilt template prefix. Large bodies (diffs
+        # can run to tens of KB) are gzip-compressed at level 1 — cheap CPU
+        # for a much smaller upload; small prompts skip the compression.
+        # Not every OpenAI-compatible server decompresses request bodies,
+        # so a 4xx on a gzipped attempt falls back to plain and disables
+        # compression for the rest of this client's life.
+        plain_body = self._body_prefix + _json_dumps(messages) + b"}"
+        body = plain_body
+        extra_headers = None
+        if self._gzip_ok and len(plain_body) > _GZIP_THRESHOLD_BYTES:
+            body = gzip.compress(plain_body, compresslevel=1)
+            extra_headers = {"Content-Encoding": "gzip"}
 
         last_error: str | None = None
 
-        # Respect throttle before first attempt
-        self._throttle()
-
         for attempt in range(1, self.max_retries + 1):
+            # Wait for bucket admission before every attempt (including
+            # retries after a 429 penalty).
+            self._throttle(estimated_tokens)
+
             try:
                 self._last_call_time = time.monotonic()
                 self._total_calls += 1
 
-                resp = requests.post(
+                resp = self._session.post(
                     url,
-                    headers=headers,
-                    json=payload,
+                    data=body,
+                    headers=extra_headers,
                     timeout=self.timeout,
+                    stream=True,
                 )
 
                 if resp.status_code == 200:
                     self._decay_adaptive_delay()
-                    data = resp.json()
+                    self._observe_success()
+                    data = _json_loads(self._read_body(resp))
                     return data["choices"][0]["message"]["content"]
 
                 # Rate-limited
                 if resp.status_code == 429:
                     last_error = "rate-limited (429) — your API plan's rate limit was exceeded"
-                    retry_after = float(resp.headers.get("Retry-After", 2 ** attempt))
+                    retry_after = float(
+                        resp.headers.get("Retry-After", 0) or self._backoff(attempt)
+                    )
                     self._ramp_adaptive_delay(retry_after)
+                    self._observe_429(retry_after)
                     wait = max(retry_after, self._base_delay_s + self._adaptive_delay_s)
-                    print(f"    Rate-limited (429). Waiting {wait:.1f}s … (attempt {attempt}/{self.max_retries})")
-                    self._total_throttle_s += wait
-                    time.sleep(wait)
+                    print(f"    Rate-limited (429). Penalizing bucket {wait:.1f}s … (attempt {attempt}/{self.max_retries})")
+                    # Penalize the shared bucket instead of sleeping here:
+                    # all workers back off together, and the retry blocks in
+                    # _throttle() on the next iteration.
+                    self._bucket.penalize(wait)
+                    if self._token_bucket is not None:
+                        self._token_bucket.penalize(wait)
+                    resp.close()  # release the streamed connection to the pool
                     continue
 
                 # Transient server error
                 if resp.status_code >= 500:
                     last_error = f"server error (HTTP {resp.status_code})"
-                    wait = 2 ** attempt
-                    print(f"    Server error ({resp.status_code}). Retry {attempt} in {wait}s…")
+                    wait = self._backoff(attempt)
+                    print(f"    Server error ({resp.status_code}). Retry {attempt} in {wait:.1f}s…")
+                    resp.close()
                     time.sleep(wait)
                     continue
 
-                # Client error — don't retry
+                # Client error. If the body was gzipped, assume the server
+                # can't decompress requests (most compatible stacks don't)
+                # and resend uncompressed before giving up.
+                if extra_headers is not None and resp.status_code not in (401, 403, 429):
+                    print(f"    HTTP {resp.status_code} on gzipped request — "
+                          f"endpoint may not accept compressed bodies, resending plain")
+                    self._gzip_ok = False
+                    body = plain_body
+                    extra_headers = None
+                    last_error = f"HTTP {resp.status_code} on gzipped request"
+                    resp.close()
+                    continue
+
+                # Don't retry
                 snippet = resp.text[:500]
                 if resp.status_code in (401, 403):
                     raise RuntimeError(
@@ -256,14 +581,14 @@ class AIClient:
 
             except requests.exceptions.Timeout:
                 last_error = f"request timed out after {self.timeout}s"
-                wait = 2 ** attempt
-                print(f"    Timeout on attempt {attempt}. Retrying in {wait}s…")
+                wait = self._backoff(attempt)
+                print(f"    Timeout on attempt {attempt}. Retrying in {wait:.1f}s…")
                 time.sleep(wait)
 
             except requests.exceptions.ConnectionError as exc:
                 last_error = f"connection error — {str(exc)[:150]}"
-                wait = 2 ** attempt
-                print(f"    Connection error on attempt {attempt}. Retrying in {wait}s…")
+                wait = self._backoff(attempt)
+                print(f"    Connection error on attempt {attempt}. Retrying in {wait:.1f}s…")
                 time.sleep(wait)
 
         raise RuntimeError(
@@ -273,28 +598,22 @@ class AIClient:
     @staticmethod
     def _parse_json(text: str) -> dict:
         """Parse JSON from AI output, tolerating markdown fences."""
-        text = text.strip()
-
-        # Strip ```json … ``` wrappers
-        if text.startswith("```"):
-            lines = text.split("\n")
-            lines = lines[1:]  # drop opening fence
-            if lines and lines[-1].strip() == "```":
-                lines = lines[:-1]
-            text = "\n".join(lines)
+        # Strip ```json … ``` wrappers with one compiled match instead of
+        # split/join over every line.
+        m = _FENCE_RE.match(text)
+        text = m.group(1) if m else text.strip()
 
         try:
-            return json.loads(text)
-        except json.JSONDecodeError:
+            return _json_loads(text)
+        except ValueError:
             pass
 
-        # Try to extract the first JSON object
-        start = text.find("{")
-        end = text.rfind("}") + 1
-        if start >= 0 and end > start:
+        # Try to extract the first balanced JSON object
+        candidate = _extract_first_json_obj(text.encode("utf-8"))
+        if candidate:
             try:
-                return json.loads(text[start:end])
-            except json.JSONDecodeError:
+                return _json_loads(candidate)
+            except ValueError:
                 pass
 
         # Last resort: wrap the raw text as a finding
@@ -5,6 +5,10 @@ from pathlib import Path
 
 import yaml
 
+# Prefer the libyaml C parser when PyYAML was built with it — same safe
+# semantics, ~10x faster. Resolved once at import.
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 # ---------------------------------------------------------------------------
 # Defaults
 # ---------------------------------------------------------------------------
@@ -24,9 +28,14 @@ DEFAULTS = {
     "max_context_tokens": 100000,
     "exclude_patterns": [],
     "custom_checks_dir": "",
+    "cache_dir": "",
     "github_token": "",
     "config_file": "",
     "request_delay_ms": 0,
+    "requests_per_minute": 0,
+    "tokens_per_minute": 0,
+    "max_parallel_batches": 4,
+    "max_parallel_checks": 1,
     "temperature": 0.1,
     "api_timeout": 300,
     "debug": False,
@@ -40,6 +49,65 @@ ALL_BUILTIN_CHECKS = [
     "container-security",
 ]
 
+# ---------------------------------------------------------------------------
+# Env-var overrides
+#
+# Coercion is dispatched through callables baked in at module load —
+# no string-kind branching in the loop. Coercers return None to mean
+# "unparsable, keep the default" (no valid input maps to None).
+# ---------------------------------------------------------------------------
+
+
+def _to_bool(raw):
+    return raw.lower() in ("true", "1", "yes")
+
+
+def _to_int(raw):
+    try:
+        return int(raw)
+    except ValueError:
+        return None
+
+
+def _to_float(raw):
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+def _to_csv(raw):
+    return [p.strip() for p in raw.split(",") if p.strip()]
+
+
+_ENV_MAP = {
+    "PRGUARD_API_BASE_URL": ("api_base_url", str),
+    "PRGUARD_MODEL": ("model", str),
+    "PRGUARD_CHECKS": ("checks", str),
+    "PRGUARD_FULL_SCAN": ("full_scan", _to_bool),
+    "PRGUARD_DIFF_ONLY": ("diff_only", _to_bool),
+    "PRGUARD_SEVERITY_THRESHOLD": ("severity_threshold", str),
+    "PRGUARD_OUTPUT_FORMAT": ("output_format", str),
+    "PRGUARD_SHIP_TO": ("ship_to", str),
+    "PRGUARD_SHIP_WEBHOOK_URL": ("ship_webhook_url", str),
+    "PRGUARD_SHIP_FILE_PATH": ("ship_file_path", str),
+    "PRGUARD_MAX_FILE_SIZE_KB": ("max_file_size_kb", _to_int),
+    "PRGUARD_MAX_CONTEXT_TOKENS": ("max_context_tokens", _to_int),
+    "PRGUARD_EXCLUDE_PATTERNS": ("exclude_patterns", _to_csv),
+    "PRGUARD_CUSTOM_CHECKS_DIR": ("custom_checks_dir", str),
+    "PRGUARD_CACHE_DIR": ("cache_dir", str),
+    "PRGUARD_GITHUB_TOKEN": ("github_token", str),
+    "PRGUARD_CONFIG_FILE": ("config_file", str),
+    "PRGUARD_REQUEST_DELAY_MS": ("request_delay_ms", _to_int),
+    "PRGUARD_REQUESTS_PER_MINUTE": ("requests_per_minute", _to_int),
+    "PRGUARD_TOKENS_PER_MINUTE": ("tokens_per_minute", _to_int),
+    "PRGUARD_MAX_PARALLEL_BATCHES": ("max_parallel_batches", _to_int),
+    "PRGUARD_MAX_PARALLEL_CHECKS": ("max_parallel_checks", _to_int),
+    "PRGUARD_TEMPERATURE": ("temperature", _to_float),
+    "PRGUARD_API_TIMEOUT": ("api_timeout", _to_int),
+    "PRGUARD_DEBUG": ("debug", _to_bool),
+}
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
@@ -65,49 +133,13 @@ def load_config():
         raise SystemExit("::error::Missing required input: api-key")
 
     # --- Env-var overrides -----------------------------------------------
-    _ENV_MAP = {
-        "PRGUARD_API_BASE_URL": ("api_base_url", "str"),
-        "PRGUARD_MODEL": ("model", "str"),
-        "PRGUARD_CHECKS": ("checks", "str"),
-        "PRGUARD_FULL_SCAN": ("full_scan", "bool"),
-        "PRGUARD_DIFF_ONLY": ("diff_only", "bool"),
-        "PRGUARD_SEVERITY_THRESHOLD": ("severity_threshold", "str"),
-        "PRGUARD_OUTPUT_FORMAT": ("output_format", "str"),
-        "PRGUARD_SHIP_TO": ("ship_to", "str"),
-        "PRGUARD_SHIP_WEBHOOK_URL": ("ship_webhook_url", "str"),
-        "PRGUARD_SHIP_FILE_PATH": ("ship_file_path", "str"),
-        "PRGUARD_MAX_FILE_SIZE_KB": ("max_file_size_kb", "int"),
-        "PRGUARD_MAX_CONTEXT_TOKENS": ("max_context_tokens", "int"),
-        "PRGUARD_EXCLUDE_PATTERNS": ("exclude_patterns", "csv"),
-        "PRGUARD_CUSTOM_CHECKS_DIR": ("custom_checks_dir", "str"),
-        "PRGUARD_GITHUB_TOKEN": ("github_token", "str"),
-        "PRGUARD_CONFIG_FILE": ("config_file", "str"),
-        "PRGUARD_REQUEST_DELAY_MS": ("request_delay_ms", "int"),
-        "PRGUARD_TEMPERATURE": ("temperature", "float"),
-        "PRGUARD_API_TIMEOUT": ("api_timeout", "int"),
-        "PRGUARD_DEBUG": ("debug", "bool"),
-    }
-
-    for env_var, (key, kind) in _ENV_MAP.items():
+    for env_var, (key, coerce) in _ENV_MAP.items():
         raw = os.environ.get(env_var, "")
         if not raw:
             continue
-        if kind == "bool":
-            config[key] = raw.lower() in ("true", "1", "yes")
-        elif kind == "int":
-            try:
-                config[key] = int(raw)
-            except ValueError:
-                pass
-        elif kind == "float":
-            try:
-                config[key] = float(raw)
-            except ValueError:
-                pass
-        elif kind == "csv":
-            config[key] = [p.strip() for p in raw.split(",") if p.strip()]
-        else:
-            config[key] = raw
+        value = coerce(raw)
+        if value is not None:
+            config[key] = value
 
     # --- full-scan overrides diff-only ------------------------------------
     if config["full_scan"]:
@@ -116,21 +148,61 @@ def load_config():
     # --- User config file ------------------------------------------------
     config["user_overrides"] = _load_user_config(config)
 
-    # --- Resolve enabled checks ------------------------------------------
-    config["enabled_checks"] = _resolve_checks(config)
+    # Check resolution and definition loading happen lazily on first
+    # access of enabled_checks / check_definitions (see Config).
+    return Config(config)
+
 
-    # --- Load check definitions (prompt + config) ------------------------
-    config["check_definitions"] = _load_check_definitions(config)
+class Config:
+    """Mapping-style view over the merged configuration.
 
-    # Log check loading result
-    loaded = list(config["check_definitions"].keys())
-    if len(loaded) < len(config["enabled_checks"]):
-        missing = set(config["enabled_checks"]) - set(loaded)
-        print(f"::warning::Failed to load checks: {', '.join(missing)}")
-    if config.get("debug"):
-        print(f"  [debug] Loaded check definitions: {', '.join(loaded)}")
+    ``enabled_checks`` and ``check_definitions`` resolve lazily on first
+    access and are then memoized — callers that only read scalar settings
+    never pay the check discovery and YAML parsing. Dict-style access
+    keeps existing ``config["key"]`` / ``config.get("key")`` call sites
+    working unchanged.
+    """
 
-    return config
+    def __init__(self, data: dict):
+        self._data = data
+        self._enabled_checks = None
+        self._check_definitions = None
+
+    @property
+    def enabled_checks(self) -> list[str]:
+        if self._enabled_checks is None:
+            self._enabled_checks = _resolve_checks(self)
+        return self._enabled_checks
+
+    @property
+    def check_definitions(self) -> dict:
+        if self._check_definitions is None:
+            definitions = _load_check_definitions(self)
+            if len(definitions) < len(self.enabled_checks):
+                missing = set(self.enabled_checks) - set(definitions)
+                print(f"::warning::Failed to load checks: {', '.join(missing)}")
+            if self._data.get("debug"):
+                print(f"  [debug] Loaded check definitions: {', '.join(definitions)}")
+            self._check_definitions = definitions
+        return self._check_definitions
+
+    def __getitem__(self, key):
+        if key == "enabled_checks":
+            return self.enabled_checks
+        if key == "check_definitions":
+            return self.check_definitions
+        return self._data[key]
+
+    def __setitem__(self, key, value):
+        self._data[key] = value
+
+    def __contains__(self, key):
+        return key in ("enabled_checks", "check_definitions") or key in self._data
+
+    def get(self, key, default=None):
+        if key in ("enabled_checks", "check_definitions"):
+            return self[key]
+        return self._data.get(key, default)
 
 
 # ---------------------------------------------------------------------------
@@ -151,9 +223,33 @@ def _load_user_config(config):
     return {}
 
 
+# Parsed-YAML cache keyed by path, invalidated on mtime/size change.
+_yaml_cache: dict[str, tuple[int, int, dict]] = {}
+
+
 def _read_yaml(path):
+    """Parse a YAML file, serving repeat reads from an mtime/size-keyed cache.
+
+    Callers treat the returned mapping as read-only (merges copy), so the
+    cached object is returned directly.
+    """
+    try:
+        st = os.stat(path)
+        stamp = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = None
+
+    if stamp is not None:
+        cached = _yaml_cache.get(path)
+        if cached is not None and (cached[0], cached[1]) == stamp:
+            return cached[2]
+
     with open(path, encoding="utf-8") as fh:
-        return yaml.safe_load(fh) or {}
+        data = yaml.load(fh, Loader=_YAML_LOADER) or {}
+
+    if stamp is not None:
+        _yaml_cache[path] = (stamp[0], stamp[1], data)
+    return data
 
 
 def _resolve_checks(config):
@@ -165,15 +261,18 @@ def _resolve_checks(config):
     else:
         enabled = [c.strip() for c in checks_input.split(",") if c.strip()]
 
-    # If user has a custom checks dir, discover additional checks there
+    # If user has a custom checks dir, discover additional checks there.
+    # scandir reuses the stat data from the directory read, so is_dir()
+    # costs no extra syscall per entry.
     custom_dir = config.get("custom_checks_dir", "")
     if custom_dir and os.path.isdir(custom_dir):
-        for entry in sorted(os.listdir(custom_dir)):
-            check_path = os.path.join(custom_dir, entry)
-            if os.path.isdir(check_path) and entry not in enabled:
+        with os.scandir(custom_dir) as it:
+            entries = sorted(it, key=lambda e: e.name)
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False) and entry.name not in enabled:
                 # Only add if it has a prompt
-                if os.path.isfile(os.path.join(check_path, "prompt.md")):
-                    enabled.append(entry)
+                if os.path.isfile(os.path.join(entry.path, "prompt.md")):
+                    enabled.append(entry.name)
 
     # Apply user overrides (enable/disable)
     user_checks = config.get("user_overrides", {}).get("checks", {})
@@ -189,8 +288,61 @@ def _resolve_checks(config):
     return enabled
 
 
+class CheckDefinition:
+    """A check whose prompt and config load lazily.
+
+    Only path resolution happens while building the definition table;
+    ``prompt.md`` is read and ``config.yml`` parsed/merged the first time
+    the corresponding attribute is accessed, then memoized. Checks that
+    end up matching no files never pay the file reads.
+    """
+
+    def __init__(self, name, prompt_path, builtin_dir, custom_dir, user_overrides):
+        self.name = name
+        self._prompt_path = prompt_path
+        self._builtin_dir = builtin_dir
+        self._custom_dir = custom_dir
+        self._user_overrides = user_overrides if isinstance(user_overrides, dict) else {}
+        self._prompt = None
+        self._config = None
+
+    @property
+    def prompt(self) -> str:
+        if self._prompt is None:
+            text = self._prompt_path.read_text(encoding="utf-8")
+
+            # Append extra prompt instructions from the user config
+            extra = self._user_overrides.get("extra_instructions", "")
+            if extra:
+                text += f"\n\n## Additional Instructions\n\n{extra}"
+            self._prompt = text
+        return self._prompt
+
+    @property
+    def config(self) -> dict:
+        if self._config is None:
+            check_config = {}
+            if (self._builtin_dir / "config.yml").is_file():
+                check_config = _read_yaml(str(self._builtin_dir / "config.yml"))
+
+            if self._custom_dir and (self._custom_dir / "config.yml").is_file():
+                check_config = _deep_merge(
+                    check_config, _read_yaml(str(self._custom_dir / "config.yml"))
+                )
+
+            # User overrides for this specific check
+            if self._user_overrides:
+                check_config = _deep_merge(check_config, self._user_overrides)
+            self._config = check_config
+        return self._config
+
+
 def _load_check_definitions(config):
-    """Load prompt.md and config.yml for every enabled check."""
+    """Resolve a CheckDefinition for every enabled check.
+
+    Prompts and configs are loaded lazily by CheckDefinition; only the
+    prompt.md existence check happens here.
+    """
     definitions = {}
     action_path = Path(config["action_path"])
 
@@ -213,47 +365,39 @@ def _load_check_definitions(config):
             print(f"::warning::No prompt.md for check '{check_name}' — skipping")
             continue
 
-        prompt_text = prompt_path.read_text(encoding="utf-8")
-
-        # --- Check-level config -------------------------------------------
-        check_config = {}
-        if (builtin_dir / "config.yml").is_file():
-            check_config = _read_yaml(str(builtin_dir / "config.yml"))
-
-        if custom_dir and (custom_dir / "config.yml").is_file():
-            check_config = _deep_merge(
-                check_config, _read_yaml(str(custom_dir / "config.yml"))
-            )
-
-        # User overrides for this specific check
         user_check = (
             config.get("user_overrides", {}).get("checks", {}).get(check_name, {})
         )
-        if isinstance(user_check, dict):
-            check_config = _deep_merge(check_config, user_check)
 
-            # Append extra prompt instructions
-            extra = user_check.get("extra_instructions", "")
-            if extra:
-                prompt_text += f"\n\n## Additional Instructions\n\n{extra}"
-
-        definitions[check_name] = {
-            "name": check_name,
-            "prompt": prompt_text,
-            "config": check_config,
-        }
+        definitions[check_name] = CheckDefinition(
+            name=check_name,
+            prompt_path=prompt_path,
+            builtin_dir=builtin_dir,
+            custom_dir=custom_dir,
+            user_overrides=user_check,
+        )
 
     return definitions
 
 
 def _deep_merge(base, override):
-    """Recursively merge *override* into *base*. Override values win."""
+    """Recursively merge *override* into *base*. Override values win.
+
+    Empty overrides return *base* unchanged (callers never mutate merge
+    results), and empty sub-dicts/lists are skipped rather than copied —
+    configs are small, so avoiding the no-op rebuilds is most of the cost.
+    """
+    if not override:
+        return base
     result = dict(base)
     for key, val in override.items():
-        if key in result and isinstance(result[key], dict) and isinstance(val, dict):
-            result[key] = _deep_merge(result[key], val)
-        elif key in result and isinstance(result[key], list) and isinstance(val, list):
-            result[key] = list(result[key]) + list(val)
+        existing = result.get(key)
+        if isinstance(existing, dict) and isinstance(val, dict):
+            if val:
+                result[key] = _deep_merge(existing, val)
+        elif isinstance(existing, list) and isinstance(val, list):
+            if val:
+                result[key] = existing + val if existing else val
         else:
             result[key] = val
     return result
@@ -1,362 +1,594 @@
-"""Collect files for analysis based on check-specific and global configuration."""
-
-import os
-import re
-import subprocess
-from pathlib import Path
-
-# ---------------------------------------------------------------------------
-# Binary / generated extensions to always skip
-# ---------------------------------------------------------------------------
-
-BINARY_EXTENSIONS = frozenset({
-    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".svg", ".webp",
-    ".woff", ".woff2", ".ttf", ".eot", ".otf",
-    ".zip", ".tar", ".gz", ".bz2", ".rar", ".7z",
-    ".exe", ".dll", ".so", ".dylib", ".bin",
-    ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
-    ".pyc", ".pyo", ".class", ".o", ".obj",
-    ".db", ".sqlite", ".sqlite3",
-    ".min.js", ".min.css", ".map",
-    ".wasm", ".parquet", ".avro",
-})
-
-DEFAULT_EXCLUDES = [
-    "**/.git/**",
-    "**/node_modules/**",
-    "**/__pycache__/**",
-    "**/venv/**",
-    "**/.venv/**",
-    "**/dist/**",
-    "**/build/**",
-    "**/.next/**",
-    "**/coverage/**",
-    "**/*.min.js",
-    "**/*.min.css",
-    "**/*.map",
-    "**/*.lock",
-    "**/package-lock.json",
-    "**/yarn.lock",
-    "**/poetry.lock",
-    "**/Pipfile.lock",
-    "**/go.sum",
-    "**/composer.lock",
-    "**/.terraform/**",
-    "**/.terragrunt-cache/**",
-]
-
-# ---------------------------------------------------------------------------
-# Module-level cache for git diff (avoid running git N times for N checks)
-# ---------------------------------------------------------------------------
-
-_changed_files_cache: list[str] | None = None
-_all_files_cache: list[str] | None = None
-
-# ---------------------------------------------------------------------------
-# Public API
-# ---------------------------------------------------------------------------
-
-
-def collect_files(check_config, global_config):
-    """Return a sorted list of file paths matching the check's criteria.
-
-    Logs skip-reason summary and detailed paths when ``debug`` is True.
-    """
-    debug = global_config.get("debug", False)
-
-    include_patterns = check_config.get("file_patterns", ["**/*"])
-    exclude_patterns = (
-        list(DEFAULT_EXCLUDES)
-        + check_config.get("exclude_patterns", [])
-        + global_config.get("exclude_patterns", [])
-    )
-    max_size_kb = global_config.get("max_file_size_kb", 100)
-    diff_only = global_config.get("diff_only", True)
-
-    # Get candidate files — cached after first call
-    candidates = _get_candidates(diff_only, debug)
-    if not candidates:
-        if debug:
-            print("    [debug] No candidate files returned from git")
-        return []
-
-    if debug:
-        print(f"    [debug] Candidates from git: {len(candidates)}")
-
-    matched = []
-    skip_reasons: dict[str, int] = {}
-
-    for filepath in candidates:
-        # Skip binary extensions
-        ext = _ext(filepath)
-        if ext in BINARY_EXTENSIONS:
-            skip_reasons["binary_ext"] = skip_reasons.get("binary_ext", 0) + 1
-            continue
-
-        # Include patterns
-        if not _matches_any(filepath, include_patterns):
-            skip_reasons["no_pattern_match"] = skip_reasons.get("no_pattern_match", 0) + 1
-            continue
-
-        # Exclude patterns
-        if _matches_any(filepath, exclude_patterns):
-            skip_reasons["excluded"] = skip_reasons.get("excluded", 0) + 1
-            continue
-
-        # File must exist and be within size limit
-        if not os.path.isfile(filepath):
-            skip_reasons["not_found"] = skip_reasons.get("not_found", 0) + 1
-            continue
-        try:
-            size_kb = os.path.getsize(filepath) / 1024
-        except OSError:
-            skip_reasons["os_error"] = skip_reasons.get("os_error", 0) + 1
-            continue
-        if size_kb > max_size_kb:
-            skip_reasons["too_large"] = skip_reasons.get("too_large", 0) + 1
-            if debug:
-                print(f"    [debug] Skipped (>{max_size_kb}KB): {filepath} ({size_kb:.1f}KB)")
-            continue
-
-        # Heuristic binary check
-        if _is_binary_file(filepath):
-            skip_reasons["binary_content"] = skip_reasons.get("binary_content", 0) + 1
-            continue
-
-        matched.append(filepath)
-
-    # Always log a compact summary of why files were filtered
-    if skip_reasons:
-        parts = [f"{v} {k}" for k, v in sorted(skip_reasons.items(), key=lambda x: -x[1])]
-        print(f"    Filtered out : {', '.join(parts)}")
-
-    if debug and matched:
-        for f in matched[:20]:
-            print(f"    [debug]  + {f}")
-        if len(matched) > 20:
-            print(f"    [debug]  ... and {len(matched) - 20} more")
-
-    return sorted(set(matched))
-
-
-def reset_cache():
-    """Clear the file-list caches (useful for testing)."""
-    global _changed_files_cache, _all_files_cache
-    _changed_files_cache = None
-    _all_files_cache = None
-
-
-def read_file_content(filepath, max_lines=2000):
-    """Read file content safely. Returns ``(content, truncated)``."""
-    try:
-        with open(filepath, "r", encoding="utf-8", errors="replace") as fh:
-            lines = fh.readlines()
-
-        truncated = len(lines) > max_lines
-        content = "".join(lines[:max_lines])
-        if truncated:
-            content += f"\n... (truncated — {len(lines) - max_lines} more lines)\n"
-        return content, truncated
-    except Exception as exc:
-        return f"(error reading file: {exc})", False
-
-
-# ---------------------------------------------------------------------------
-# Git helpers
-# ---------------------------------------------------------------------------
-
-
-def _get_candidates(diff_only: bool, debug: bool = False) -> list[str]:
-    """Return candidate file list, using a module-level cache."""
-    global _changed_files_cache, _all_files_cache
-
-    if diff_only:
-        if _changed_files_cache is None:
-            _changed_files_cache = _get_changed_files(debug)
-        return _changed_files_cache
-    else:
-        if _all_files_cache is None:
-            _all_files_cache = _get_all_tracked_files(debug)
-        return _all_files_cache
-
-
-def _get_changed_files(debug: bool = False) -> list[str]:
-    """Get the list of changed files in the current PR or push.
-
-    Tries multiple strategies with graceful fallback:
-      1. PR diff (GITHUB_BASE_REF)
-      2. Push diff (GITHUB_EVENT_BEFORE)
-      3. HEAD~1 diff
-      4. All tracked files
-    """
-    base_ref = os.environ.get("GITHUB_BASE_REF", "")
-
-    # --- Strategy 1: PR context ------------------------------------------
-    if base_ref:
-        print(f"  Git context   : PR (base={base_ref})")
-        _run_git(["fetch", "origin", base_ref, "--depth=1"], debug=debug)
-        result = _run_git(
-            ["diff", "--name-only", "--diff-filter=ACMRT", f"origin/{base_ref}...HEAD"],
-            debug=debug,
-        )
-        if result is not None:
-            files = _split_lines(result)
-            print(f"  Changed files : {len(files)} (PR diff vs origin/{base_ref})")
-            return files
-
-    # --- Strategy 2: Push context ----------------------------------------
-    event_before = os.environ.get("GITHUB_EVENT_BEFORE", "")
-    if event_before and event_before != "0" * 40:
-        print(f"  Git context   : push (before={event_before[:12]}…)")
-        result = _run_git(
-            ["diff", "--name-only", "--diff-filter=ACMRT", f"{event_before}...HEAD"],
-            debug=debug,
-        )
-        if result is not None:
-            files = _split_lines(result)
-            print(f"  Changed files : {len(files)} (push diff)")
-            return files
-
-        # Shallow clone may not have the before commit — try fetching it
-        print("    Push diff failed (shallow clone?). Fetching before-SHA…")
-        _run_git(["fetch", "origin", event_before, "--depth=1"], debug=debug)
-        result = _run_git(
-            ["diff", "--name-only", "--diff-filter=ACMRT", f"{event_before}...HEAD"],
-            debug=debug,
-        )
-        if result is not None:
-            files = _split_lines(result)
-            print(f"  Changed files : {len(files)} (push diff after fetch)")
-            return files
-
-    # --- Strategy 3: HEAD~1 fallback -------------------------------------
-    print("  Git context   : fallback (HEAD~1)")
-    result = _run_git(
-        ["diff", "--name-only", "--diff-filter=ACMRT", "HEAD~1"], debug=debug
-    )
-    if result is not None:
-        files = _split_lines(result)
-        print(f"  Changed files : {len(files)} (HEAD~1)")
-        return files
-
-    # --- Strategy 4: all tracked files -----------------------------------
-    print("::warning::All git diff strategies failed — scanning ALL tracked files")
-    return _get_all_tracked_files(debug)
-
-
-def _get_all_tracked_files(debug: bool = False) -> list[str]:
-    """Return all git-tracked files."""
-    result = _run_git(["ls-files"], debug=debug)
-    if result is None:
-        print("::warning::git ls-files failed — no files to analyze")
-        return []
-    files = _split_lines(result)
-    print(f"  Tracked files : {len(files)} (full repo)")
-    return files
-
-
-def _run_git(args, debug: bool = False):
-    """Run a git command and return stdout, or None on failure."""
-    try:
-        proc = subprocess.run(
-            ["git"] + args,
-            capture_output=True,
-            text=True,
-            timeout=60,
-        )
-        if debug:
-            cmd = "git " + " ".join(args[:3])
-            if len(args) > 3:
-                cmd += " …"
-            print(f"    [debug] {cmd} → exit={proc.returncode}")
-            if proc.returncode != 0 and proc.stderr:
-                err_line = proc.stderr.strip().split("\n")[0][:200]
-                print(f"    [debug]   stderr: {err_line}")
-        return proc.stdout if proc.returncode == 0 else None
-    except Exception as exc:
-        if debug:
-            print(f"    [debug] git command exception: {exc}")
-        return None
-
-
-def _split_lines(text: str) -> list[str]:
-    """Split git output into non-empty trimmed lines."""
-    return [f.strip() for f in text.strip().split("\n") if f.strip()]
-
-
-# ---------------------------------------------------------------------------
-# Glob → regex matcher (supports **/)
-# ---------------------------------------------------------------------------
-
-_regex_cache: dict[str, re.Pattern] = {}
-
-
-def _glob_to_regex(pattern: str) -> re.Pattern:
-    """Convert a glob pattern (with ``**/`` support) to a compiled regex."""
-    if pattern in _regex_cache:
-        return _regex_cache[pattern]
-
-    pat = pattern.replace("\\", "/")
-    parts: list[str] = []
-    i = 0
-    while i < len(pat):
-        c = pat[i]
-        if c == "*":
-            if i + 1 < len(pat) and pat[i + 1] == "*":
-                # **
-                if i + 2 < len(pat) and pat[i + 2] == "/":
-                    parts.append("(?:.+/)?")
-                    i += 3
-                    continue
-                else:
-                    parts.append(".*")
-                    i += 2
-                    continue
-            else:
-                parts.append("[^/]*")
-        elif c == "?":
-            parts.append("[^/]")
-        elif c in ".+^${}()|[]!\\":
-            parts.append("\\" + c)
-        else:
-            parts.append(c)
-        i += 1
-
-    compiled = re.compile("^" + "".join(parts) + "$")
-    _regex_cache[pattern] = compiled
-    return compiled
-
-
-def _matches_any(filepath: str, patterns: list[str]) -> bool:
-    """Return True if *filepath* matches at least one glob pattern."""
-    filepath = filepath.replace("\\", "/")
-    for pattern in patterns:
-        regex = _glob_to_regex(pattern)
-        if regex.match(filepath):
-            return True
-    return False
-
-
-# ---------------------------------------------------------------------------
-# Misc helpers
-# ---------------------------------------------------------------------------
-
-
-def _ext(filepath: str) -> str:
-    """Return the lowercased extension, including compound ones like .min.js."""
-    name = os.path.basename(filepath).lower()
-    # Handle compound extensions
-    for compound in (".min.js", ".min.css"):
-        if name.endswith(compound):
-            return compound
-    return os.path.splitext(name)[1]
-
-
-def _is_binary_file(filepath: str, chunk_size: int = 8192) -> bool:
-    """Heuristic: file is binary if its first chunk contains null bytes."""
-    try:
-        with open(filepath, "rb") as fh:
-            chunk = fh.read(chunk_size)
-        return b"\x00" in chunk
-    except Exception:
-        return True
+"""Collect files for analysis based on check-specific and global configuration."""
+
+import mmap
+import os
+import re
+import stat
+import subprocess
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# ---------------------------------------------------------------------------
+# Binary / generated extensions to always skip
+# ---------------------------------------------------------------------------
+
+BINARY_EXTENSIONS = frozenset({
+    ".png", ".jpg", ".jpeg", ".gif", ".bmp", ".ico", ".svg", ".webp",
+    ".woff", ".woff2", ".ttf", ".eot", ".otf",
+    ".zip", ".tar", ".gz", ".bz2", ".rar", ".7z",
+    ".exe", ".dll", ".so", ".dylib", ".bin",
+    ".pdf", ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx",
+    ".pyc", ".pyo", ".class", ".o", ".obj",
+    ".db", ".sqlite", ".sqlite3",
+    ".min.js", ".min.css", ".map",
+    ".wasm", ".parquet", ".avro",
+})
+
+# Tuple form for str.endswith — one C-level scan covers every extension,
+# including compound ones like .min.js, against the lowercased path.
+_BINARY_SUFFIX_TUPLE = tuple(sorted(BINARY_EXTENSIONS))
+
+DEFAULT_EXCLUDES = [
+    "**/.git/**",
+    "**/node_modules/**",
+    "**/__pycache__/**",
+    "**/venv/**",
+    "**/.venv/**",
+    "**/dist/**",
+    "**/build/**",
+    "**/.next/**",
+    "**/coverage/**",
+    "**/*.min.js",
+    "**/*.min.css",
+    "**/*.map",
+    "**/*.lock",
+    "**/package-lock.json",
+    "**/yarn.lock",
+    "**/poetry.lock",
+    "**/Pipfile.lock",
+    "**/go.sum",
+    "**/composer.lock",
+    "**/.terraform/**",
+    "**/.terragrunt-cache/**",
+]
+
+# ---------------------------------------------------------------------------
+# Module-level cache for git diff (avoid running git N times for N checks)
+# ---------------------------------------------------------------------------
+
+_changed_files_cache: list[str] | None = None
+_all_files_cache: list[str] | None = None
+
+# (id(global_config), tuple) — the DEFAULT_EXCLUDES + global-excludes half
+# of the exclude list is invariant across checks, so build it once per run.
+_base_exclude_cache: tuple[int, tuple[str, ...]] | None = None
+
+
+def _base_excludes(global_config) -> tuple[str, ...]:
+    """Return DEFAULT_EXCLUDES plus the run-wide exclude patterns.
+
+    Checks with no excludes of their own then pass the identical tuple to
+    the pattern-plan caches every call.
+    """
+    global _base_exclude_cache
+    key = id(global_config)
+    if _base_exclude_cache is None or _base_exclude_cache[0] != key:
+        _base_exclude_cache = (
+            key,
+            tuple(DEFAULT_EXCLUDES) + tuple(global_config.get("exclude_patterns", [])),
+        )
+    return _base_exclude_cache[1]
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+
+def collect_files(check_config, global_config):
+    """Return a sorted list of file paths matching the check's criteria.
+
+    Logs skip-reason summary and detailed paths when ``debug`` is True.
+    """
+    debug = global_config.get("debug", False)
+
+    include_patterns = check_config.get("file_patterns", ["**/*"])
+    exclude_patterns = _base_excludes(global_config)
+    check_excludes = check_config.get("exclude_patterns", [])
+    if check_excludes:
+        exclude_patterns = exclude_patterns + tuple(check_excludes)
+    max_size_kb = global_config.get("max_file_size_kb", 100)
+    max_size_bytes = max_size_kb * 1024
+    diff_only = global_config.get("diff_only", True)
+
+    # Get candidate files — cached after first call
+    candidates = _get_candidates(diff_only, debug)
+    if not candidates:
+        if debug:
+            print("    [debug] No candidate files returned from git")
+        return []
+
+    if debug:
+        print(f"    [debug] Candidates from git: {len(candidates)}")
+
+    matched = []
+    skip_reasons: Counter[str] = Counter()
+
+    # --- Pass 1: cheap in-memory filters (suffix/pattern matching) --------
+    incl_suffixes, incl_regex = _include_plan(tuple(include_patterns))
+
+    survivors = []
+    for filepath in candidates:
+        # Skip binary extensions
+        if filepath.lower().endswith(_BINARY_SUFFIX_TUPLE):
+            skip_reasons["binary_ext"] += 1
+            continue
+
+        # Include patterns — suffix fast path, then regex
+        if not (
+            (incl_suffixes and filepath.endswith(incl_suffixes))
+            or incl_regex.match(filepath)
+        ):
+            skip_reasons["no_pattern_match"] += 1
+            continue
+
+        # Exclude patterns — substring/suffix prefilters, then regex
+        if _is_excluded(filepath, exclude_patterns):
+            skip_reasons["excluded"] += 1
+            continue
+
+        survivors.append(filepath)
+
+    # --- Pass 2: filesystem checks (stat + binary probe) ------------------
+    # These are syscall-bound and release the GIL, so large changesets go
+    # through a thread pool; small ones stay serial to skip pool startup.
+    if len(survivors) > _PARALLEL_FS_THRESHOLD:
+        workers = min(32, (os.cpu_count() or 4) * 4)
+        with ThreadPoolExecutor(max_workers=workers) as ex:
+            verdicts = list(
+                ex.map(lambda p: _fs_check(p, max_size_bytes), survivors)
+            )
+    else:
+        verdicts = [_fs_check(p, max_size_bytes) for p in survivors]
+
+    seen = set()
+    for filepath, reason in zip(survivors, verdicts):
+        if reason is None:
+            # git output is already unique, but candidates may one day come
+            # from merged sources — dedup inline instead of a set() rebuild
+            if filepath not in seen:
+                seen.add(filepath)
+                matched.append(filepath)
+            continue
+        skip_reasons[reason] += 1
+        if debug and reason == "too_large":
+            print(f"    [debug] Skipped (>{max_size_kb}KB): {filepath}")
+
+    # Always log a compact summary of why files were filtered
+    if skip_reasons:
+        parts = [f"{v} {k}" for k, v in skip_reasons.most_common()]
+        print(f"    Filtered out : {', '.join(parts)}")
+
+    if debug and matched:
+        for f in matched[:20]:
+            print(f"    [debug]  + {f}")
+        if len(matched) > 20:
+            print(f"    [debug]  ... and {len(matched) - 20} more")
+
+    # Sort in place for deterministic downstream batching — matched is
+    # already unique, so no set() round trip.
+    matched.sort()
+    return matched
+
+
+# Candidate counts above this go through the thread pool in pass 2
+_PARALLEL_FS_THRESHOLD = 64
+
+
+def _fs_check(filepath: str, max_size_bytes: int) -> str | None:
+    """Run the filesystem checks for one candidate.
+
+    Returns a skip reason (``not_found``, ``os_error``, ``too_large``,
+    ``binary_content``) or None when the file passes. A single open
+    serves the regular-file, size, and binary-content probes via fstat
+    and one 8 KB read — no separate stat + reopen.
+    """
+    try:
+        # O_NONBLOCK so a stray FIFO can't hang the open; harmless for
+        # regular files.
+        fd = os.open(filepath, os.O_RDONLY | getattr(os, "O_NONBLOCK", 0))
+    except FileNotFoundError:
+        return "not_found"
+    except OSError:
+        return "os_error"
+    try:
+        st = os.fstat(fd)
+        if not stat.S_ISREG(st.st_mode):
+            return "not_found"
+        if st.st_size > max_size_bytes:
+            return "too_large"
+        head = os.read(fd, 8192)
+    except OSError:
+        return "os_error"
+    finally:
+        os.close(fd)
+    if b"\x00" in head:
+        return "binary_content"
+    return None
+
+
+def reset_cache():
+    """Clear the file-list caches (useful for testing)."""
+    global _changed_files_cache, _all_files_cache
+    _changed_files_cache = None
+    _all_files_cache = None
+
+
+# Files above this are read through mmap with MAP_POPULATE (Linux-only),
+# which prefaults every page up front instead of stalling per 4 KiB
+# during decode. Mostly matters for big checked-in fixtures.
+_MMAP_THRESHOLD = 256 * 1024
+_HAS_MAP_POPULATE = hasattr(mmap, "MAP_POPULATE")
+_HAS_FADVISE = hasattr(os, "posix_fadvise")
+
+
+def _read_text(filepath):
+    """Read *filepath* as text, prefaulting large files via mmap."""
+    if _HAS_MAP_POPULATE and os.path.getsize(filepath) > _MMAP_THRESHOLD:
+        with open(filepath, "rb") as fh:
+            with mmap.mmap(
+                fh.fileno(),
+                0,
+                prot=mmap.PROT_READ,
+                flags=mmap.MAP_PRIVATE | mmap.MAP_POPULATE,
+            ) as mm:
+                return bytes(mm).decode("utf-8", errors="replace")
+    with open(filepath, "r", encoding="utf-8", errors="replace") as fh:
+        if _HAS_FADVISE:
+            # Tell the kernel we'll read this file start-to-finish so it
+            # prefetches ahead of us — cold page caches on CI runners
+            # otherwise fault a readahead window at a time.
+            try:
+                os.posix_fadvise(
+                    fh.fileno(),
+                    0,
+                    0,
+                    os.POSIX_FADV_SEQUENTIAL | os.POSIX_FADV_WILLNEED,
+                )
+            except OSError:
+                pass
+        return fh.read()
+
+
+def read_file_content(filepath, max_lines=2000):
+    """Read file content safely. Returns ``(content, truncated)``.
+
+    Reads once and splits at most ``max_lines`` times — files under the
+    limit are returned as-is without ever materializing a per-line list.
+    """
+    try:
+        data = _read_text(filepath)
+
+        parts = data.split("\n", max_lines)
+        tail = parts[-1]
+        if len(parts) <= max_lines or not tail:
+            # Under the limit (a trailing newline is not an extra line)
+            return data, False
+
+        # The tail holds everything past the cut — count what we drop
+        extra_lines = tail.count("\n") + (0 if tail.endswith("\n") else 1)
+        head = "\n".join(parts[:max_lines])
+        return (
+            head + f"\n... (truncated — {extra_lines} more lines)\n",
+            True,
+        )
+    except Exception as exc:
+        return f"(error reading file: {exc})", False
+
+
+# ---------------------------------------------------------------------------
+# Git helpers
+# ---------------------------------------------------------------------------
+
+
+# Checks may collect files from worker threads — serialize the first
+# (cache-filling) git run so it only happens once.
+_candidates_lock = threading.Lock()
+
+
+def _get_candidates(diff_only: bool, debug: bool = False) -> list[str]:
+    """Return candidate file list, using a module-level cache."""
+    global _changed_files_cache, _all_files_cache
+
+    with _candidates_lock:
+        if diff_only:
+            if _changed_files_cache is None:
+                _changed_files_cache = _get_changed_files(debug)
+            return _changed_files_cache
+        else:
+            if _all_files_cache is None:
+                _all_files_cache = _get_all_tracked_files(debug)
+            return _all_files_cache
+
+
+def _get_changed_files(debug: bool = False) -> list[str]:
+    """Get the list of changed files in the current PR or push.
+
+    Tries multiple strategies with graceful fallback:
+      1. PR diff (GITHUB_BASE_REF)
+      2. Push diff (GITHUB_EVENT_BEFORE)
+      3. HEAD~1 diff
+      4. All tracked files
+    """
+    base_ref = os.environ.get("GITHUB_BASE_REF", "")
+
+    # --- Strategy 1: PR context ------------------------------------------
+    if base_ref:
+        print(f"  Git context   : PR (base={base_ref})")
+        _run_git(["fetch", "origin", base_ref, "--depth=1"], debug=debug)
+        result = _run_git(
+            ["diff", "-z", "--name-only", "--diff-filter=ACMRT", f"origin/{base_ref}...HEAD"],
+            debug=debug,
+        )
+        if result is not None:
+            files = _split_nul(result)
+            print(f"  Changed files : {len(files)} (PR diff vs origin/{base_ref})")
+            return files
+
+    # --- Strategy 2: Push context ----------------------------------------
+    event_before = os.environ.get("GITHUB_EVENT_BEFORE", "")
+    if event_before and event_before != "0" * 40:
+        print(f"  Git context   : push (before={event_before[:12]}…)")
+        result = _run_git(
+            ["diff", "-z", "--name-only", "--diff-filter=ACMRT", f"{event_before}...HEAD"],
+            debug=debug,
+        )
+        if result is not None:
+            files = _split_nul(result)
+            print(f"  Changed files : {len(files)} (push diff)")
+            return files
+
+        # Shallow clone may not have the before commit — try fetching it
+        print("    Push diff failed (shallow clone?). Fetching before-SHA…")
+        _run_git(["fetch", "origin", event_before, "--depth=1"], debug=debug)
+        result = _run_git(
+            ["diff", "-z", "--name-only", "--diff-filter=ACMRT", f"{event_before}...HEAD"],
+            debug=debug,
+        )
+        if result is not None:
+            files = _split_nul(result)
+            print(f"  Changed files : {len(files)} (push diff after fetch)")
+            return files
+
+    # --- Strategy 3: HEAD~1 fallback -------------------------------------
+    print("  Git context   : fallback (HEAD~1)")
+    result = _run_git(
+        ["diff", "-z", "--name-only", "--diff-filter=ACMRT", "HEAD~1"], debug=debug
+    )
+    if result is not None:
+        files = _split_nul(result)
+        print(f"  Changed files : {len(files)} (HEAD~1)")
+        return files
+
+    # --- Strategy 4: all tracked files -----------------------------------
+    print("::warning::All git diff strategies failed — scanning ALL tracked files")
+    return _get_all_tracked_files(debug)
+
+
+def _get_all_tracked_files(debug: bool = False) -> list[str]:
+    """Return all git-tracked files."""
+    result = _run_git(["ls-files", "-z"], debug=debug)
+    if result is None:
+        print("::warning::git ls-files failed — no files to analyze")
+        return []
+    files = _split_nul(result)
+    print(f"  Tracked files : {len(files)} (full repo)")
+    return files
+
+
+# Global git flags applied to every invocation: skip optional lock files
+# (we only read), preload the index with threads, and never trigger an
+# auto-gc from a throwaway CI clone.
+_GIT_GLOBAL_ARGS = [
+    "--no-optional-locks",
+    "-c", "core.preloadindex=true",
+    "-c", "gc.auto=0",
+]
+
+
+def _run_git(args, debug: bool = False):
+    """Run a git command and return raw stdout bytes, or None on failure."""
+    try:
+        proc = subprocess.run(
+            ["git"] + _GIT_GLOBAL_ARGS + args,
+            capture_output=True,
+            timeout=60,
+        )
+        if debug:
+            cmd = "git " + " ".join(args[:3])
+            if len(args) > 3:
+                cmd += " …"
+            print(f"    [debug] {cmd} → exit={proc.returncode}")
+            if proc.returncode != 0 and proc.stderr:
+                err_line = proc.stderr.decode("utf-8", "replace").strip().split("\n")[0][:200]
+                print(f"    [debug]   stderr: {err_line}")
+        return proc.stdout if proc.returncode == 0 else None
+    except Exception as exc:
+        if debug:
+            print(f"    [debug] git command exception: {exc}")
+        return None
+
+
+def _split_nul(data: bytes) -> list[str]:
+    """Split NUL-delimited git output (from ``-z``) into decoded paths."""
+    return [f.decode("utf-8", "replace") for f in data.split(b"\x00") if f]
+
+
+# ---------------------------------------------------------------------------
+# Glob → regex matcher (supports **/)
+# ---------------------------------------------------------------------------
+
+_regex_cache: dict[str, re.Pattern] = {}
+_union_cache: dict[tuple[str, ...], re.Pattern] = {}
+
+
+def _glob_to_regex_str(pattern: str) -> str:
+    """Translate a glob pattern (with ``**/`` support) to a regex body."""
+    pat = pattern.replace("\\", "/")
+    parts: list[str] = []
+    i = 0
+    while i < len(pat):
+        c = pat[i]
+        if c == "*":
+            if i + 1 < len(pat) and pat[i + 1] == "*":
+                # **
+                if i + 2 < len(pat) and pat[i + 2] == "/":
+                    parts.append("(?:.+/)?")
+                    i += 3
+                    continue
+                else:
+                    parts.append(".*")
+                    i += 2
+                    continue
+            else:
+                parts.append("[^/]*")
+        elif c == "?":
+            parts.append("[^/]")
+        elif c in ".+^${}()|[]!\\":
+            parts.append("\\" + c)
+        else:
+            parts.append(c)
+        i += 1
+
+    return "".join(parts)
+
+
+def _glob_to_regex(pattern: str) -> re.Pattern:
+    """Convert a glob pattern (with ``**/`` support) to a compiled regex."""
+    compiled = _regex_cache.get(pattern)
+    if compiled is None:
+        compiled = re.compile("^" + _glob_to_regex_str(pattern) + "$")
+        _regex_cache[pattern] = compiled
+    return compiled
+
+
+def _glob_union(patterns: tuple[str, ...]) -> re.Pattern:
+    """Compile a list of glob patterns into one alternation regex.
+
+    One C-level match per file replaces a Python loop over individual
+    patterns. An empty pattern list compiles to a never-matching regex.
+    """
+    compiled = _union_cache.get(patterns)
+    if compiled is None:
+        if patterns:
+            body = "|".join(f"(?:{_glob_to_regex_str(p)})" for p in patterns)
+        else:
+            body = "(?!)"  # matches nothing
+        compiled = re.compile("^(?:" + body + ")$")
+        _union_cache[patterns] = compiled
+    return compiled
+
+
+def _matches_any(filepath: str, patterns: list[str]) -> bool:
+    """Return True if *filepath* matches at least one glob pattern."""
+    filepath = filepath.replace("\\", "/")
+    return _glob_union(tuple(patterns)).match(filepath) is not None
+
+
+# ---------------------------------------------------------------------------
+# Exclude-pattern fast paths
+#
+# Most excludes are simple shapes that don't need a regex at all:
+#   **/NAME/**  → substring "/NAME/" test
+#   **/*.EXT    → suffix ".EXT" test
+#   **/NAME     → suffix "/NAME" test
+# Only patterns outside those shapes fall back to the union regex.
+# ---------------------------------------------------------------------------
+
+_DIR_PATTERN_RE = re.compile(r"^\*\*/([^*?\[\]/]+)/\*\*$")
+# "**/" required: a bare "*.EXT" only matches top-level files, so it is
+# not suffix-safe and falls through to the regex.
+_SUFFIX_PATTERN_RE = re.compile(r"^\*\*/\*(\.[^*?/\[\]]+)$")
+_NAME_PATTERN_RE = re.compile(r"^\*\*/([^*?/\[\]]+)$")
+
+_exclude_plan_cache: dict[tuple[str, ...], tuple] = {}
+
+
+def _exclude_plan(patterns: tuple[str, ...]):
+    """Split patterns into (dir substrings, suffixes, fallback regex)."""
+    plan = _exclude_plan_cache.get(patterns)
+    if plan is None:
+        dir_subs: list[str] = []
+        suffixes: list[str] = []
+        complex_patterns: list[str] = []
+        for p in patterns:
+            m = _DIR_PATTERN_RE.match(p)
+            if m:
+                dir_subs.append(f"/{m.group(1)}/")
+                continue
+            m = _SUFFIX_PATTERN_RE.match(p)
+            if m:
+                suffixes.append(m.group(1))
+                continue
+            m = _NAME_PATTERN_RE.match(p)
+            if m:
+                suffixes.append(f"/{m.group(1)}")
+                continue
+            complex_patterns.append(p)
+        plan = (tuple(dir_subs), tuple(suffixes), _glob_union(tuple(complex_patterns)))
+        _exclude_plan_cache[patterns] = plan
+    return plan
+
+
+_include_plan_cache: dict[tuple[str, ...], tuple] = {}
+
+
+def _include_plan(patterns: tuple[str, ...]):
+    """Split include patterns into (suffix tuple, fallback regex).
+
+    Patterns of the exact shape ``**/*.EXT`` reduce to one endswith
+    test; everything else goes through the union regex.
+    """
+    plan = _include_plan_cache.get(patterns)
+    if plan is None:
+        suffixes: list[str] = []
+        rest: list[str] = []
+        for p in patterns:
+            m = _SUFFIX_PATTERN_RE.match(p)
+            if m:
+                suffixes.append(m.group(1))
+            else:
+                rest.append(p)
+        plan = (tuple(suffixes), _glob_union(tuple(rest)))
+        _include_plan_cache[patterns] = plan
+    return plan
+
+
+def _is_excluded(filepath: str, patterns: tuple[str, ...]) -> bool:
+    """Exclude-pattern match using the cheap prefilters before any regex."""
+    dir_subs, suffixes, complex_re = _exclude_plan(patterns)
+    # Leading "/" so both "/NAME/" substrings and "/NAME" suffixes also
+    # hit at the repository root.
+    npath = "/" + filepath.replace("\\", "/")
+    if suffixes and npath.endswith(suffixes):
+        return True
+    for sub in dir_subs:
+        if sub in npath:
+            return True
+    return complex_re.match(filepath) is not None
+
+
+# ---------------------------------------------------------------------------
+# Misc helpers
+# ---------------------------------------------------------------------------
+
+
+def _is_binary_file(filepath: str, chunk_size: int = 8192) -> bool:
+    """Heuristic: file is binary if its first chunk contains null bytes."""
+    try:
+        with open(filepath, "rb") as fh:
+            chunk = fh.read(chunk_size)
+        return b"\x00" in chunk
+    except Exception:
+        return True
@@ -11,10 +11,12 @@ sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 from config_loader import load_config
 from runner import CheckRunner
 from ai_client import AIClient
-from output_formatter import format_report, sanitize_output
+from output_formatter import compute_stats, format_report, sanitize_output
 from shipper import ship_results
 
 SEVERITY_ORDER = ["info", "low", "medium", "high", "critical"]
+# O(1) severity rank lookups for the hot per-finding paths
+_SEV_IDX = {s: i for i, s in enumerate(SEVERITY_ORDER)}
 
 
 def main():
@@ -86,40 +88,49 @@ def main():
     runner = CheckRunner(config)
     results = runner.run()
 
+    # Finding counts — computed once, shared by formatters and the summary
+    stats = compute_stats(results)
+
     # ------------------------------------------------------------------
     # 4. Format & sanitize
     # ------------------------------------------------------------------
-    print(f"\n[4/6] Formatting report ({config['output_format']})...")
-    report = format_report(results, config)
-    print("[5/6] Sanitizing output...")
-    safe_report = sanitize_output(report, config)
+    destinations = {
+        d.strip() for d in config.get("ship_to", "github-summary").split(",") if d.strip()
+    }
+    if config["output_format"] in ("json", "sarif") and destinations <= {"file"}:
+        # The file shipper streams these formats straight to disk,
+        # sanitized entry-by-entry — skip building the report in memory.
+        print(f"\n[4/6] Formatting report ({config['output_format']}, streamed)...")
+        print("[5/6] Sanitizing output... (per entry while streaming)")
+        safe_report = ""
+    else:
+        print(f"\n[4/6] Formatting report ({config['output_format']})...")
+        report = format_report(results, config, stats)
+        print("[5/6] Sanitizing output...")
+        safe_report = sanitize_output(report, config)
 
     # ------------------------------------------------------------------
     # 5. Ship results
     # ------------------------------------------------------------------
     print(f"[6/6] Shipping results to {config['ship_to']}...")
-    report_path = ship_results(safe_report, results, config)
+    report_path = ship_results(safe_report, results, config, stats)
 
     # ------------------------------------------------------------------
     # 5. Summary & outputs
     # ------------------------------------------------------------------
     elapsed = time.time() - start_time
-    total_findings = sum(len(r["findings"]) for r in results)
-    files_analyzed = sum(r["files_analyzed"] for r in results)
+    total_findings = stats["total"]
 
-    # Per-check breakdown
+    # Per-check breakdown — files_analyzed tallied in the same walk
+    files_analyzed = 0
     print("\n  Per-check results:")
     for r in results:
         fc = r["files_analyzed"]
+        files_analyzed += fc
         fn = len(r["findings"])
         print(f"    {r['check']:>20} : {fc} file(s), {fn} finding(s)")
 
-    by_severity = {}
-    for r in results:
-        for f in r["findings"]:
-            sev = f.get("severity", "info")
-            by_severity[sev] = by_severity.get(sev, 0) + 1
-
+    by_severity = stats["by_severity"]
     critical = by_severity.get("critical", 0)
     high = by_severity.get("high", 0)
 
@@ -133,8 +144,9 @@ def main():
             print(f"    {sev:>8} : {count}")
     print(f"{'=' * 60}")
 
-    # Determine exit code based on severity threshold
-    should_fail = _above_threshold(results, config["severity_threshold"])
+    # Determine exit code based on severity threshold — answered from the
+    # by-severity counts instead of re-walking every finding
+    should_fail = _above_threshold(by_severity, config["severity_threshold"])
     exit_code = 1 if should_fail else 0
 
     _set_outputs(total_findings, critical, report_path, exit_code)
@@ -151,29 +163,34 @@ def main():
 # Helpers
 # ------------------------------------------------------------------
 
-def _above_threshold(results, threshold):
+def _above_threshold(by_severity, threshold):
     """Return True if any finding meets or exceeds the severity threshold."""
-    if threshold not in SEVERITY_ORDER:
+    threshold_idx = _SEV_IDX.get(threshold)
+    if threshold_idx is None:
         return False
-    threshold_idx = SEVERITY_ORDER.index(threshold)
-    for r in results:
-        for f in r["findings"]:
-            sev = f.get("severity", "info")
-            if sev in SEVERITY_ORDER and SEVERITY_ORDER.index(sev) >= threshold_idx:
-                return True
-    return False
+    return any(
+        by_severity.get(sev, 0) for sev in SEVERITY_ORDER[threshold_idx:]
+    )
 
 
 def _set_outputs(findings_count, critical_count, report_path, exit_code):
     """Write to $GITHUB_OUTPUT for downstream steps."""
     output_file = os.environ.get("GITHUB_OUTPUT", "")
     if output_file:
+        # One O_APPEND write keeps the block atomic on POSIX even if
+        # several steps append to the same file concurrently.
+        payload = (
+            f"findings-count={findings_count}\n"
+            f"critical-count={critical_count}\n"
+            f"report-path={report_path}\n"
+            f"exit-code={exit_code}\n"
+        ).encode("utf-8")
         try:
-            with open(output_file, "a") as fh:
-                fh.write(f"findings-count={findings_count}\n")
-                fh.write(f"critical-count={critical_count}\n")
-                fh.write(f"report-path={report_path}\n")
-                fh.write(f"exit-code={exit_code}\n")
+            fd = os.open(output_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, payload)
+            finally:
+                os.close(fd)
         except OSError as exc:
             print(f"::warning::Could not write GITHUB_OUTPUT: {exc}")
 
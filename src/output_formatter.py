@@ -1,272 +1,433 @@
-"""Format check results and sanitize any accidentally leaked secrets."""
-
-import json
-import re
-import os
-from datetime import datetime, timezone
-
-# ---------------------------------------------------------------------------
-# Constants
-# ---------------------------------------------------------------------------
-
-SEVERITY_ICONS = {
-    "critical": "\U0001f534",   # 🔴
-    "high":     "\U0001f7e0",   # 🟠
-    "medium":   "\U0001f7e1",   # 🟡
-    "low":      "\U0001f535",   # 🔵
-    "info":     "\u26aa",       # ⚪
-}
-
-SEVERITY_ORDER = ["critical", "high", "medium", "low", "info"]
-
-# ---------------------------------------------------------------------------
-# Public API
-# ---------------------------------------------------------------------------
-
-
-def format_report(results: list[dict], config: dict) -> str:
-    """Format results into the requested output format."""
-    fmt = config.get("output_format", "markdown")
-    if fmt == "json":
-        return _format_json(results, config)
-    if fmt == "sarif":
-        return _format_sarif(results, config)
-    return _format_markdown(results, config)
-
-
-def sanitize_output(report: str, config: dict) -> str:
-    """Strip any sensitive material that may have leaked into the report."""
-    sanitized = report
-
-    for pattern in _SENSITIVE_RE:
-        sanitized = pattern.sub("[REDACTED]", sanitized)
-
-    # Redact the actual API key
-    api_key = config.get("api_key", "")
-    if api_key and len(api_key) > 8:
-        sanitized = sanitized.replace(api_key, "[REDACTED]")
-
-    return sanitized
-
-
-# ---------------------------------------------------------------------------
-# Markdown formatter
-# ---------------------------------------------------------------------------
-
-
-def _format_markdown(results: list[dict], config: dict) -> str:
-    lines: list[str] = []
-    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
-
-
-    lines.append("# \U0001f6e1\ufe0f PR Guard AI Report\n")
-    lines.append(f"**Date:** {now}  ")
-    lines.append(f"**Model:** `{config.get('model', 'n/a')}`  ")
-    lines.append(f"**Checks:** {', '.join(config.get('enabled_checks', []))}\n")
-
-    # -- Summary table -----------------------------------------------------
-    total = sum(len(r["findings"]) for r in results)
-
-    lines.append("## Summary\n")
-    lines.append("| Check | Files | Findings |")
-    lines.append("|-------|------:|:--------:|")
-    for r in results:
-        lines.append(f"| {r['check']} | {r['files_analyzed']} | {len(r['findings'])} |")
-    lines.append(f"| **Total** | | **{total}** |\n")
-
-    # -- Severity breakdown ------------------------------------------------
-    sev_counts: dict[str, int] = {}
-    for r in results:
-        for f in r["findings"]:
-            s = f.get("severity", "info")
-            sev_counts[s] = sev_counts.get(s, 0) + 1
-
-    if sev_counts:
-        lines.append("### Severity Breakdown\n")
-        for s in SEVERITY_ORDER:
-            c = sev_counts.get(s, 0)
-            if c:
-                lines.append(f"- {SEVERITY_ICONS.get(s, '')} **{s.upper()}**: {c}")
-        lines.append("")
-
-    # -- Detailed findings -------------------------------------------------
-    for r in results:
-        if not r["findings"]:
-            continue
-
-        lines.append(f"## {r['check']}\n")
-
-        sorted_findings = sorted(
-            r["findings"],
-            key=lambda f: SEVERITY_ORDER.index(f.get("severity", "info"))
-            if f.get("severity", "info") in SEVERITY_ORDER
-            else 99,
-        )
-
-        for idx, finding in enumerate(sorted_findings, 1):
-            sev = finding.get("severity", "info")
-            icon = SEVERITY_ICONS.get(sev, "\u26aa")
-            title = finding.get("title", "Finding")
-            fp = finding.get("file", "")
-            line_no = finding.get("line", 0)
-
-            loc = ""
-            if fp:
-                loc = f" in `{fp}`"
-                if line_no:
-                    loc += f" (line {line_no})"
-
-            lines.append(f"### {icon} {idx}. {title}")
-            lines.append(
-                f"**Severity:** {sev.upper()} · "
-                f"**Category:** {finding.get('category', 'general')}"
-                f"{loc}\n"
-            )
-            if finding.get("description"):
-                lines.append(f"{finding['description']}\n")
-            if finding.get("suggestion"):
-                lines.append(f"**\U0001f4a1 Suggestion:** {finding['suggestion']}\n")
-            lines.append("---\n")
-
-    if total == 0:
-        lines.append("## \u2705 No Issues Found\n")
-        lines.append("All checks passed without findings.\n")
-
-    return "\n".join(lines)
-
-
-# ---------------------------------------------------------------------------
-# JSON formatter
-# ---------------------------------------------------------------------------
-
-
-def _format_json(results: list[dict], config: dict) -> str:
-    output = {
-        "meta": {
-            "tool": "pr-guard-ai",
-            "version": "1.0.0",
-            "date": datetime.now(timezone.utc).isoformat(),
-            "model": config.get("model", "unknown"),
-            "checks": config.get("enabled_checks", []),
-        },
-        "summary": {
-            "total_findings": sum(len(r["findings"]) for r in results),
-            "by_severity": {},
-            "by_check": {},
-        },
-        "results": results,
-    }
-
-    for r in results:
-        output["summary"]["by_check"][r["check"]] = len(r["findings"])
-        for f in r["findings"]:
-            s = f.get("severity", "info")
-            output["summary"]["by_severity"][s] = (
-                output["summary"]["by_severity"].get(s, 0) + 1
-            )
-
-    return json.dumps(output, indent=2, default=str)
-
-
-# ---------------------------------------------------------------------------
-# SARIF formatter  (GitHub Code Scanning compatible)
-# ---------------------------------------------------------------------------
-
-
-def _format_sarif(results: list[dict], config: dict) -> str:
-    sev_map = {
-        "critical": "error",
-        "high": "error",
-        "medium": "warning",
-        "low": "note",
-        "info": "note",
-    }
-
-    run = {
-        "tool": {
-            "driver": {
-                "name": "PR Guard AI",
-                "version": "1.0.0",
-                "informationUri": "https://github.com/dexterite/pr-guard-ai",
-                "rules": [],
-            }
-        },
-        "results": [],
-    }
-
-    rules_seen: set[str] = set()
-
-    for r in results:
-        for finding in r["findings"]:
-            cat = finding.get("category", "general")
-            rule_id = f"{r['check']}/{cat}"
-
-            if rule_id not in rules_seen:
-                rules_seen.add(rule_id)
-                run["tool"]["driver"]["rules"].append(
-                    {
-                        "id": rule_id,
-                        "shortDescription": {
-                            "text": finding.get("title", cat)
-                        },
-                    }
-                )
-
-            entry: dict = {
-                "ruleId": rule_id,
-                "level": sev_map.get(finding.get("severity", "info"), "note"),
-                "message": {
-                    "text": finding.get(
-                        "description", finding.get("title", "")
-                    )
-                },
-            }
-
-            fp = finding.get("file", "")
-            ln = finding.get("line", 1)
-            if fp:
-                entry["locations"] = [
-                    {
-                        "physicalLocation": {
-                            "artifactLocation": {"uri": fp},
-                            "region": {"startLine": max(1, ln)},
-                        }
-                    }
-                ]
-
-            run["results"].append(entry)
-
-    sarif = {
-        "$schema": (
-            "https://docs.oasis-open.org/sarif/sarif/v2.1.0/"
-            "sarif-schema-2.1.0.json"
-        ),
-        "version": "2.1.0",
-        "runs": [run],
-    }
-
-    return json.dumps(sarif, indent=2)
-
-
-# ---------------------------------------------------------------------------
-# Sanitization patterns
-# ---------------------------------------------------------------------------
-
-_SENSITIVE_RE = [
-    re.compile(
-        r"(?i)(api[_-]?key|apikey|secret|password|passwd|token|bearer|auth)"
-        r"\s*[:=]\s*[\"']?[\w+/=\-]{8,}"
-    ),
-    re.compile(
-        r"(?i)(aws|azure|gcp|github|slack|sendgrid|twilio)"
-        r"[_-]?(key|secret|token)\s*[:=]\s*[\"']?[\w+/=\-]{8,}"
-    ),
-    re.compile(r"-----BEGIN\s+(RSA\s+)?PRIVATE\s+KEY-----"),
-    re.compile(r"ghp_[A-Za-z0-9]{36}"),
-    re.compile(r"gho_[A-Za-z0-9]{36}"),
-    re.compile(r"sk-[A-Za-z0-9]{48}"),
-    re.compile(r"eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}"),
-    re.compile(r"AKIA[0-9A-Z]{16}"),
-    re.compile(r"xox[bprs]-[A-Za-z0-9\-]+"),
-    re.compile(r"SG\.[A-Za-z0-9_-]{22}\.[A-Za-z0-9_-]{43}"),
-]
+"""Format check results and sanitize any accidentally leaked secrets."""
+
+import io
+import json
+import re
+import os
+from datetime import datetime, timezone
+
+try:
+    # Optional accelerator — not a declared dependency, but picked up
+    # automatically when present in the runner's environment.
+    import orjson
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2, default=str).decode("utf-8")
+except ImportError:
+    def _dumps(obj) -> str:
+        return json.dumps(obj, indent=2, default=str)
+
+# ---------------------------------------------------------------------------
+# Constants
+# ---------------------------------------------------------------------------
+
+SEVERITY_ICONS = {
+    "critical": "\U0001f534",   # 🔴
+    "high":     "\U0001f7e0",   # 🟠
+    "medium":   "\U0001f7e1",   # 🟡
+    "low":      "\U0001f535",   # 🔵
+    "info":     "\u26aa",       # ⚪
+}
+
+SEVERITY_ORDER = ["critical", "high", "medium", "low", "info"]
+# O(1) severity rank lookups — unknown severities sort last
+_SEV_IDX = {s: i for i, s in enumerate(SEVERITY_ORDER)}
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+
+
+def compute_stats(results: list[dict]) -> dict:
+    """One pass over all findings: total, by-severity and by-check counts.
+
+    Computed once in main() and threaded through the formatters so none
+    of them re-scan the findings.
+    """
+    stats = {"total": 0, "by_severity": {}, "by_check": {}}
+    for r in results:
+        n = len(r["findings"])
+        stats["by_check"][r["check"]] = n
+        stats["total"] += n
+        for f in r["findings"]:
+            s = f.get("severity", "info")
+            stats["by_severity"][s] = stats["by_severity"].get(s, 0) + 1
+    return stats
+
+
+def format_report(results: list[dict], config: dict, stats: dict | None = None) -> str:
+    """Format results into the requested output format."""
+    if stats is None:
+        stats = compute_stats(results)
+    fmt = config.get("output_format", "markdown")
+    if fmt == "json":
+        return _format_json(results, config, stats)
+    if fmt == "sarif":
+        return _format_sarif(results, config)
+    return _format_markdown(results, config, stats)
+
+
+def format_report_stream(
+    results: list[dict], config: dict, fh, stats: dict | None = None
+) -> None:
+    """Stream a json/sarif report to an open file handle.
+
+    Entries are serialized and sanitized one finding at a time, so peak
+    memory stays bounded by the largest finding instead of the whole
+    report string. Markdown reports are small and keep using
+    ``format_report``.
+    """
+    fmt = config.get("output_format", "markdown")
+    if fmt == "json":
+        _stream_json(results, config, fh, stats or compute_stats(results))
+    elif fmt == "sarif":
+        _stream_sarif(results, config, fh)
+    else:
+        raise ValueError(f"format_report_stream does not support '{fmt}'")
+
+
+def sanitize_output(report: str, config: dict) -> str:
+    """Strip any sensitive material that may have leaked into the report."""
+    # Bytes-mode regex skips per-codepoint Unicode handling; one encode/
+    # decode round trip is cheaper than Unicode-scanning the whole report.
+    # All patterns are pure ASCII, so they can't tear a UTF-8 sequence.
+    data = _SENSITIVE_RE.sub(b"[REDACTED]", report.encode("utf-8"))
+
+    # Redact the actual API key
+    api_key = config.get("api_key", "")
+    if api_key and len(api_key) > 8:
+        data = data.replace(api_key.encode("utf-8"), b"[REDACTED]")
+
+    return data.decode("utf-8")
+
+
+# ---------------------------------------------------------------------------
+# Markdown formatter
+# ---------------------------------------------------------------------------
+
+
+def _format_markdown(results: list[dict], config: dict, stats: dict) -> str:
+    # StringIO gives O(1) amortized appends; every write carries its own
+    # trailing newline, and the final one is dropped so the output stays
+    # byte-identical with the old "\n".join() assembly.
+    buf = io.StringIO()
+    w = buf.write
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+
+    w("# \U0001f6e1\ufe0f PR Guard AI Report\n\n")
+    w(f"**Date:** {now}  \n")
+    w(f"**Model:** `{config.get('model', 'n/a')}`  \n")
+    w(f"**Checks:** {', '.join(config.get('enabled_checks', []))}\n\n")
+
+    # -- Summary table -----------------------------------------------------
+    total = stats["total"]
+
+    w("## Summary\n\n")
+    w("| Check | Files | Findings |\n")
+    w("|-------|------:|:--------:|\n")
+    for r in results:
+        w(f"| {r['check']} | {r['files_analyzed']} | {len(r['findings'])} |\n")
+    w(f"| **Total** | | **{total}** |\n\n")
+
+    # -- Severity breakdown ------------------------------------------------
+    sev_counts = stats["by_severity"]
+
+    if sev_counts:
+        w("### Severity Breakdown\n\n")
+        for s in SEVERITY_ORDER:
+            c = sev_counts.get(s, 0)
+            if c:
+                w(f"- {SEVERITY_ICONS.get(s, '')} **{s.upper()}**: {c}\n")
+        w("\n")
+
+    # -- Detailed findings -------------------------------------------------
+    for r in results:
+        if not r["findings"]:
+            continue
+
+        w(f"## {r['check']}\n\n")
+
+        # Five severity buckets instead of a comparison sort — O(n), no
+        # per-comparison key lambda, and stable within each severity.
+        buckets = [[] for _ in SEVERITY_ORDER]
+        unknown = []
+        for f in r["findings"]:
+            idx2 = _SEV_IDX.get(f.get("severity", "info"))
+            (buckets[idx2] if idx2 is not None else unknown).append(f)
+        sorted_findings = [f for bucket in buckets for f in bucket] + unknown
+
+        for idx, finding in enumerate(sorted_findings, 1):
+            sev = finding.get("severity", "info")
+            icon = SEVERITY_ICONS.get(sev, "\u26aa")
+            title = finding.get("title", "Finding")
+            fp = finding.get("file", "")
+            line_no = finding.get("line", 0)
+
+            loc = ""
+            if fp:
+                loc = f" in `{fp}`"
+                if line_no:
+                    loc += f" (line {line_no})"
+
+            w(f"### {icon} {idx}. {title}\n")
+            w(
+                f"**Severity:** {sev.upper()} \u00b7 "
+                f"**Category:** {finding.get('category', 'general')}"
+                f"{loc}\n\n"
+            )
+            if finding.get("description"):
+                w(f"{finding['description']}\n\n")
+            if finding.get("suggestion"):
+                w(f"**\U0001f4a1 Suggestion:** {finding['suggestion']}\n\n")
+            w("---\n\n")
+
+    if total == 0:
+        w("## \u2705 No Issues Found\n\n")
+        w("All checks passed without findings.\n\n")
+
+    return buf.getvalue()[:-1]
+
+
+# ---------------------------------------------------------------------------
+# JSON formatter
+# ---------------------------------------------------------------------------
+
+
+def _format_json(results: list[dict], config: dict, stats: dict) -> str:
+    output = {
+        "meta": {
+            "tool": "pr-guard-ai",
+            "version": "1.0.0",
+            "date": datetime.now(timezone.utc).isoformat(),
+            "model": config.get("model", "unknown"),
+            "checks": config.get("enabled_checks", []),
+        },
+        "summary": {
+            "total_findings": stats["total"],
+            "by_severity": stats["by_severity"],
+            "by_check": stats["by_check"],
+        },
+        "results": results,
+    }
+
+    return _dumps(output)
+
+
+def _stream_json(results: list[dict], config: dict, fh, stats: dict) -> None:
+    """Incremental version of ``_format_json`` writing straight to *fh*."""
+    meta = {
+        "tool": "pr-guard-ai",
+        "version": "1.0.0",
+        "date": datetime.now(timezone.utc).isoformat(),
+        "model": config.get("model", "unknown"),
+        "checks": config.get("enabled_checks", []),
+    }
+    summary = {
+        "total_findings": stats["total"],
+        "by_severity": stats["by_severity"],
+        "by_check": stats["by_check"],
+    }
+
+    fh.write('{"meta": ')
+    fh.write(sanitize_output(json.dumps(meta, default=str), config))
+    fh.write(', "summary": ')
+    fh.write(json.dumps(summary))
+    fh.write(', "results": [')
+    for i, r in enumerate(results):
+        if i:
+            fh.write(", ")
+        # Result shell without findings, then the findings one at a time
+        shell = json.dumps(
+            {k: v for k, v in r.items() if k != "findings"}, default=str
+        )
+        fh.write(sanitize_output(shell[:-1], config))
+        fh.write(', "findings": [')
+        for j, f in enumerate(r.get("findings", [])):
+            if j:
+                fh.write(", ")
+            fh.write(sanitize_output(json.dumps(f, default=str), config))
+        fh.write("]}")
+    fh.write("]}\n")
+
+
+def _stream_sarif(results: list[dict], config: dict, fh) -> None:
+    """Incremental version of ``_format_sarif`` writing straight to *fh*.
+
+    Results stream finding-by-finding; the (small) rules table is
+    accumulated along the way and written after the results array —
+    JSON object key order is insignificant to SARIF consumers.
+    """
+    sev_map = {
+        "critical": "error",
+        "high": "error",
+        "medium": "warning",
+        "low": "note",
+        "info": "note",
+    }
+
+    fh.write(
+        '{"$schema": "https://docs.oasis-open.org/sarif/sarif/v2.1.0/'
+        'sarif-schema-2.1.0.json", "version": "2.1.0", "runs": [{"results": ['
+    )
+
+    rules: list[dict] = []
+    rules_seen: set[str] = set()
+    first = True
+
+    for r in results:
+        for finding in r["findings"]:
+            cat = finding.get("category", "general")
+            rule_id = f"{r['check']}/{cat}"
+
+            if rule_id not in rules_seen:
+                rules_seen.add(rule_id)
+                rules.append(
+                    {
+                        "id": rule_id,
+                        "shortDescription": {"text": finding.get("title", cat)},
+                    }
+                )
+
+            entry: dict = {
+                "ruleId": rule_id,
+                "level": sev_map.get(finding.get("severity", "info"), "note"),
+                "message": {
+                    "text": finding.get("description", finding.get("title", ""))
+                },
+            }
+
+            fp = finding.get("file", "")
+            ln = finding.get("line", 1)
+            if fp:
+                entry["locations"] = [
+                    {
+                        "physicalLocation": {
+                            "artifactLocation": {"uri": fp},
+                            "region": {"startLine": max(1, ln)},
+                        }
+                    }
+                ]
+
+            if not first:
+                fh.write(", ")
+            first = False
+            fh.write(sanitize_output(json.dumps(entry, default=str), config))
+
+    driver = {
+        "name": "PR Guard AI",
+        "version": "1.0.0",
+        "informationUri": "https://github.com/dexterite/pr-guard-ai",
+        "rules": rules,
+    }
+    fh.write('], "tool": {"driver": ')
+    fh.write(sanitize_output(json.dumps(driver, default=str), config))
+    fh.write("}}]}\n")
+
+
+# ---------------------------------------------------------------------------
+# SARIF formatter  (GitHub Code Scanning compatible)
+# ---------------------------------------------------------------------------
+
+
+def _format_sarif(results: list[dict], config: dict) -> str:
+    sev_map = {
+        "critical": "error",
+        "high": "error",
+        "medium": "warning",
+        "low": "note",
+        "info": "note",
+    }
+
+    run = {
+        "tool": {
+            "driver": {
+                "name": "PR Guard AI",
+                "version": "1.0.0",
+                "informationUri": "https://github.com/dexterite/pr-guard-ai",
+                "rules": [],
+            }
+        },
+        "results": [],
+    }
+
+    rules_seen: set[str] = set()
+
+    for r in results:
+        for finding in r["findings"]:
+            cat = finding.get("category", "general")
+            rule_id = f"{r['check']}/{cat}"
+
+            if rule_id not in rules_seen:
+                rules_seen.add(rule_id)
+                run["tool"]["driver"]["rules"].append(
+                    {
+                        "id": rule_id,
+                        "shortDescription": {
+                            "text": finding.get("title", cat)
+                        },
+                    }
+                )
+
+            entry: dict = {
+                "ruleId": rule_id,
+                "level": sev_map.get(finding.get("severity", "info"), "note"),
+                "message": {
+                    "text": finding.get(
+                        "description", finding.get("title", "")
+                    )
+                },
+            }
+
+            fp = finding.get("file", "")
+            ln = finding.get("line", 1)
+            if fp:
+                entry["locations"] = [
+                    {
+                        "physicalLocation": {
+                            "artifactLocation": {"uri": fp},
+                            "region": {"startLine": max(1, ln)},
+                        }
+                    }
+                ]
+
+            run["results"].append(entry)
+
+    sarif = {
+        "$schema": (
+            "https://docs.oasis-open.org/sarif/sarif/v2.1.0/"
+            "sarif-schema-2.1.0.json"
+        ),
+        "version": "2.1.0",
+        "runs": [run],
+    }
+
+    return _dumps(sarif)
+
+
+# ---------------------------------------------------------------------------
+# Sanitization patterns
+# ---------------------------------------------------------------------------
+
+# Compiled as ONE alternation so sanitize_output walks the report a
+# single time instead of once per pattern. Case-insensitivity is scoped
+# with (?i:...) to the two patterns that want it — token prefixes like
+# ghp_/AKIA/sk- are case-sensitive by design.
+_SENSITIVE_PATTERNS = [
+    r"(?i:(?:api[_-]?key|apikey|secret|password|passwd|token|bearer|auth)"
+    r"\s*[:=]\s*[\"']?[\w+/=\-]{8,})",
+    r"(?i:(?:aws|azure|gcp|github|slack|sendgrid|twilio)"
+    r"[_-]?(?:key|secret|token)\s*[:=]\s*[\"']?[\w+/=\-]{8,})",
+    r"-----BEGIN\s+(?:RSA\s+)?PRIVATE\s+KEY-----",
+    r"ghp_[A-Za-z0-9]{36}",
+    r"gho_[A-Za-z0-9]{36}",
+    r"sk-[A-Za-z0-9]{48}",
+    r"eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}",
+    r"AKIA[0-9A-Z]{16}",
+    r"xox[bprs]-[A-Za-z0-9\-]+",
+    r"SG\.[A-Za-z0-9_-]{22}\.[A-Za-z0-9_-]{43}",
+]
+
+# Compiled in bytes mode — see sanitize_output
+_SENSITIVE_RE = re.compile(
+    b"|".join(f"(?:{p})".encode("ascii") for p in _SENSITIVE_PATTERNS)
+)
@@ -1,12 +1,130 @@
 """Check runner — orchestrates AI analysis for each enabled check."""
 
+import functools
+import hashlib
+import io
+import json
+import os
+import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from ai_client import AIClient
 from file_collector import collect_files, read_file_content
 
 # Rough chars-per-token ratio for source code
-_CHARS_PER_TOKEN = 3.5
+_CHARS_PER_TOKEN = 3.5  # documentation only — estimates use the integer form below
+
+# Content sentinel marking a file whose body duplicates an earlier one;
+# the original's path follows the prefix. Never collides with real file
+# content (NUL can't survive the utf-8 "replace" read).
+_DUP_STUB_PREFIX = "\x00identical-to:"
+_DUP_STUB_TOKENS = 8  # one stub line in the prompt
+
+# Static header for every user message — built once at import instead of
+# re-assembled per batch.
+_SCHEMA_PROMPT = (
+    "Analyze the following source files and report any findings.\n\n"
+    "Respond with a JSON object in this exact schema:\n"
+    "```json\n"
+    "{\n"
+    '  "findings": [\n'
+    "    {\n"
+    '      "file": "relative/path/to/file.ext",\n'
+    '      "line": 42,\n'
+    '      "severity": "high",\n'
+    '      "category": "category-id",\n'
+    '      "title": "Short descriptive title",\n'
+    '      "description": "Detailed description of the issue",\n'
+    '      "suggestion": "How to fix it"\n'
+    "    }\n"
+    "  ],\n"
+    '  "summary": "Brief summary of findings"\n'
+    "}\n"
+    "```\n\n"
+    "Allowed severity values: critical, high, medium, low, info\n"
+    'If no issues are found return: {"findings": [], "summary": "No issues found."}\n\n'
+    "---\n\n"
+)
+
+
+@functools.lru_cache(maxsize=1)
+def _token_encoder():
+    """Return a tiktoken encoder, or None if tiktoken isn't installed.
+
+    Optional accelerator — not a declared dependency. Real token counts
+    pack batches tighter than the char ratio (fewer round trips, fewer
+    over-budget rejections); the heuristic remains the fallback.
+    """
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def _estimate_tokens(content: str) -> int:
+    enc = _token_encoder()
+    if enc is None:
+        # Integer form of len/3.5 — keeps the batching hot path free of
+        # float arithmetic without changing the ratio.
+        return (len(content) * 2) // 7
+    return len(enc.encode(content, disallowed_special=()))
+
+
+@functools.lru_cache(maxsize=4096)
+def _read_versioned(filepath: str, mtime_ns: int, size: int) -> tuple[str, int]:
+    """Cache slot for one (path, version) of a file's content + tokens."""
+    content, _ = read_file_content(filepath)
+    return content, _estimate_tokens(content)
+
+
+def _read_cached(filepath: str) -> tuple[str, int]:
+    """Read and token-estimate a file once per run.
+
+    Checks usually overlap in the files they match; the cache turns
+    K checks over N shared files into N reads instead of K*N. Keys
+    include mtime and size, so an entry self-invalidates if the file
+    changes mid-run; run() still clears the cache so a process never
+    carries contents across runs.
+    """
+    try:
+        st = os.stat(filepath)
+    except OSError:
+        return _read_versioned(filepath, 0, 0)
+    return _read_versioned(filepath, st.st_mtime_ns, st.st_size)
+
+
+class _StdoutRouter:
+    """Routes writes to a per-thread buffer when one is registered.
+
+    Parallel checks keep using plain ``print``; each check's output lands
+    in its own buffer and is flushed as one block when the check finishes,
+    so ``::group::`` sections stay contiguous in the Actions log.
+    """
+
+    def __init__(self, real):
+        self._real = real
+        self._local = threading.local()
+
+    def register(self, buf):
+        self._local.buf = buf
+
+    def unregister(self):
+        self._local.buf = None
+
+    def current(self):
+        return getattr(self._local, "buf", None)
+
+    def write(self, s):
+        buf = getattr(self._local, "buf", None)
+        return (buf if buf is not None else self._real).write(s)
+
+    def flush(self):
+        buf = getattr(self._local, "buf", None)
+        (buf if buf is not None else self._real).flush()
 
 
 class CheckRunner:
@@ -21,6 +139,8 @@ class CheckRunner:
             request_delay_ms=config.get("request_delay_ms", 0),
             temperature=config.get("temperature", 0.1),
             timeout=config.get("api_timeout", 300),
+            requests_per_minute=config.get("requests_per_minute", 0),
+            tokens_per_minute=config.get("tokens_per_minute", 0),
         )
 
     # ------------------------------------------------------------------
@@ -29,30 +149,54 @@ class CheckRunner:
 
     def run(self) -> list[dict]:
         """Execute all enabled checks. Returns a list of result dicts."""
-        results: list[dict] = []
-        total = len(self.config["check_definitions"])
+        defs = self.config["check_definitions"]
+        total = len(defs)
         self._run_start = time.monotonic()
         self._batches_done = 0
         self._batches_total = 0  # will be updated per check
+        self._progress_lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self._router = None
 
-        for i, (check_name, check_def) in enumerate(self.config["check_definitions"].items(), 1):
-            elapsed = time.monotonic() - self._run_start
-            print(f"\n::group::Check {i}/{total}: {check_name}  [{self._fmt_time(elapsed)} elapsed]")
-            result = self._run_check(check_name, check_def)
-            results.append(result)
-            print(f"::endgroup::")
+        _read_versioned.cache_clear()
+
+        workers = min(self.config.get("max_parallel_checks", 1) or 1, total or 1)
+
+        if workers > 1:
+            # Checks share nothing but the AIClient (whose throttling and
+            # caches are lock-protected), so they can overlap freely.
+            self._router = _StdoutRouter(sys.stdout)
+            sys.stdout = self._router
+            try:
+                jobs = (
+                    (i, total, name, cd) for i, (name, cd) in enumerate(defs.items(), 1)
+                )
+                with ThreadPoolExecutor(max_workers=workers) as ex:
+                    results = list(
+                        ex.map(lambda job: self._run_check_buffered(*job), jobs)
+                    )
+            finally:
+                sys.stdout = self._router._real
+                self._router = None
+        else:
+            results = []
+            for i, (check_name, check_def) in enumerate(defs.items(), 1):
+                elapsed = time.monotonic() - self._run_start
+                print(f"\n::group::Check {i}/{total}: {check_name}  [{self._fmt_time(elapsed)} elapsed]")
+                results.append(self._run_check(check_name, check_def))
+                print(f"::endgroup::")
 
         self._log_throttle_stats()
+        _read_versioned.cache_clear()  # release file contents once batching is done
         return results
 
     # ------------------------------------------------------------------
     # Internals
     # ------------------------------------------------------------------
 
-    def _run_check(self, name: str, check_def: dict) -> dict:
+    def _run_check(self, name: str, check_def) -> dict:
         """Run a single check against matching files."""
-        check_config = check_def.get("config", {})
-        prompt = check_def["prompt"]
+        check_config = check_def.config
         debug = self.config.get("debug", False)
 
         # Collect matching files
@@ -74,114 +218,291 @@ class CheckRunner:
             if len(files) > 10:
                 print(f"    [debug]   ... and {len(files) - 10} more")
 
+        # Loaded lazily — checks with no matching files never read it
+        prompt = check_def.prompt
+
+        # Optional persistent cache: files whose (model, prompt, content)
+        # was analyzed in a previous run skip the AI call entirely. Only
+        # useful when the workflow persists cache_dir (e.g. actions/cache).
+        cache_dir = self.config.get("cache_dir", "")
+        cached_findings: list[dict] = []
+        n_cached = 0
+        if cache_dir:
+            files, cached_findings, n_cached = self._cache_lookup(
+                cache_dir, name, prompt, files
+            )
+            if n_cached:
+                print(f"  Cache hits    : {n_cached} file(s) unchanged — skipped")
+            if not files:
+                return {
+                    "check": name,
+                    "files_analyzed": n_cached,
+                    "findings": cached_findings,
+                    "summary": f"Analyzed {n_cached} file(s) (all cached), "
+                               f"found {len(cached_findings)} issue(s).",
+                }
+
         # Split into token-limited batches
         print(f"  Building batches (token budget: {self.config.get('max_context_tokens', 100_000):,})...")
-        batches = self._build_batches(files)
+        batches = self._build_batches(files, prompt)
         print(f"  Batches       : {len(batches)}")
 
         all_findings: list[dict] = []
-
-        for idx, batch in enumerate(batches, start=1):
-            file_count = len(batch)
-            self._batches_done += 1
-            elapsed = time.monotonic() - self._run_start
-
-            # ETA based on average time per batch so far
-            if self._batches_done > 1:
-                avg = elapsed / (self._batches_done - 1)
-                remaining_batches = len(batches) - idx  # remaining in this check only
-                eta = avg * remaining_batches
-                eta_str = f"~{self._fmt_time(eta)} remaining"
-            else:
-                eta_str = "estimating..."
-
-            print(f"  Batch {idx}/{len(batches)} ({file_count} file(s)) "
-                  f"[{self._fmt_time(elapsed)} elapsed, {eta_str}] — sending to AI...")
-
-            batch_start = time.monotonic()
-
-            user_msg = self._build_user_message(batch)
-
-            try:
-                response = self.client.analyze(prompt, user_msg)
-                findings = response.get("findings", [])
-                summary = response.get("summary", "")
-
-                # Tag every finding with the originating check
-                for f in findings:
-                    f.setdefault("check", name)
-
+        n_batches = len(batches)
+        workers = min(self.config.get("max_parallel_batches", 4) or 1, n_batches)
+
+        if workers > 1:
+            # AI calls are I/O-bound, so threads overlap the request
+            # latency; AIClient's token bucket still paces calls globally.
+            # Findings are re-assembled in batch order so output stays
+            # deterministic regardless of completion order.
+            run_batch = self._run_batch
+            router = self._router
+            if router is not None and router.current() is not None:
+                # Batch workers are separate threads — route their prints
+                # into this check's log buffer so the group stays intact.
+                parent_buf = router.current()
+
+                def run_batch(*args, _buf=parent_buf):
+                    router.register(_buf)
+                    try:
+                        return self._run_batch(*args)
+                    finally:
+                        router.unregister()
+
+            by_idx: dict[int, tuple[list[dict], list[str]]] = {}
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                futures = {
+                    ex.submit(run_batch, name, prompt, batch, idx, n_batches): idx
+                    for idx, batch in enumerate(batches, start=1)
+                }
+                for fut in as_completed(futures):
+                    by_idx[futures[fut]] = fut.result()
+            analyzed_files: list[str] = []
+            for idx in sorted(by_idx):
+                findings, ok_files = by_idx[idx]
                 all_findings.extend(findings)
-                batch_time = time.monotonic() - batch_start
-                print(f"    → {len(findings)} finding(s) ({batch_time:.1f}s)")
-                if summary:
-                    print(f"    AI summary: {summary[:200]}")
-
-            except Exception as exc:
-                error_msg = str(exc)
-                print(f"::warning::Batch {idx} of '{name}' failed: {error_msg}")
-
-                # Build a user-friendly description
-                if "401" in error_msg or "403" in error_msg or "authentication" in error_msg.lower() or "unauthorized" in error_msg.lower():
-                    friendly = (
-                        f"Authentication failed when calling the AI API. "
-                        f"Your API key is either invalid or missing required permissions. "
-                        f"For GitHub Models, the built-in GITHUB_TOKEN does NOT work — "
-                        f"generate a Personal Access Token (PAT) and store it as a repository secret."
-                    )
-                elif "413" in error_msg or "too large" in error_msg.lower() or "tokens_limit" in error_msg.lower():
-                    friendly = (
-                        f"Batch {idx} exceeds the model's maximum token limit. "
-                        f"Set 'max-context-tokens' to a value within your model's limit "
-                        f"(e.g. 8000 for GitHub Models gpt-4o, 128000 for OpenAI gpt-4o). "
-                        f"This will split files into smaller batches that fit."
-                    )
-                elif "429" in error_msg or "rate-limit" in error_msg.lower():
-                    friendly = (
-                        f"Batch {idx} was rate-limited by the AI provider after multiple retries. "
-                        f"Try increasing 'request-delay-ms' (e.g. 500–1000) or reducing the number "
-                        f"of files with 'exclude-patterns' / 'max-file-size-kb'."
-                    )
-                elif "timeout" in error_msg.lower():
-                    friendly = (
-                        f"Batch {idx} timed out waiting for an AI response. "
-                        f"The batch may contain too many files — try lowering 'max-context-tokens' "
-                        f"to create smaller batches, or check your API endpoint availability."
-                    )
-                elif "connection" in error_msg.lower():
-                    friendly = (
-                        f"Batch {idx} could not connect to the AI API. "
-                        f"Verify 'api-base-url' is correct and the endpoint is reachable."
-                    )
-                else:
-                    friendly = f"Batch {idx} failed: {error_msg[:300]}"
-
-                batch_files = [fp for fp, _ in batch]
-                file_list = ", ".join(batch_files[:5])
-                if len(batch_files) > 5:
-                    file_list += f" (+{len(batch_files) - 5} more)"
-
-                all_findings.append(
-                    {
-                        "check": name,
-                        "severity": "medium",
-                        "title": f"AI Analysis Failed — Batch {idx}/{len(batches)}",
-                        "description": f"{friendly}\n\nAffected files: {file_list}",
-                        "file": batch_files[0] if batch_files else "",
-                        "line": 0,
-                        "category": "analysis-error",
-                        "suggestion": "Re-run with 'debug: true' for full diagnostics. "
-                                       "If rate-limited, add 'request-delay-ms: 1000'.",
-                    }
-                )
+                analyzed_files.extend(ok_files)
+        else:
+            analyzed_files = []
+            for idx, batch in enumerate(batches, start=1):
+                findings, ok_files = self._run_batch(name, prompt, batch, idx, n_batches)
+                all_findings.extend(findings)
+                analyzed_files.extend(ok_files)
+
+        if cache_dir and analyzed_files:
+            self._cache_store(cache_dir, prompt, analyzed_files, all_findings)
+        all_findings.extend(cached_findings)
 
+        total_files = len(files) + n_cached
         return {
             "check": name,
-            "files_analyzed": len(files),
+            "files_analyzed": total_files,
             "findings": all_findings,
-            "summary": f"Analyzed {len(files)} file(s), found {len(all_findings)} issue(s).",
+            "summary": f"Analyzed {total_files} file(s), found {len(all_findings)} issue(s).",
         }
 
+    def _run_check_buffered(self, i: int, total: int, name: str, check_def) -> dict:
+        """Run one check with its log output buffered into a single block."""
+        buf = io.StringIO()
+        self._router.register(buf)
+        try:
+            elapsed = time.monotonic() - self._run_start
+            print(f"\n::group::Check {i}/{total}: {name}  [{self._fmt_time(elapsed)} elapsed]")
+            result = self._run_check(name, check_def)
+            print(f"::endgroup::")
+        finally:
+            self._router.unregister()
+            with self._log_lock:
+                self._router._real.write(buf.getvalue())
+                self._router._real.flush()
+        return result
+
+    def _run_batch(
+        self, name: str, prompt: str, batch: list[tuple[str, str]], idx: int, n_batches: int
+    ) -> tuple[list[dict], list[str]]:
+        """Analyze one batch. Never raises — failures become a finding.
+
+        Returns ``(findings, analyzed_files)`` — the file list is empty
+        when the batch failed, so failed files are never cached as clean.
+        """
+        with self._progress_lock:
+            self._batches_done += 1
+            done = self._batches_done
+        elapsed = time.monotonic() - self._run_start
+
+        # ETA based on average time per batch so far
+        if done > 1:
+            avg = elapsed / (done - 1)
+            remaining_batches = n_batches - idx  # remaining in this check only
+            eta = avg * remaining_batches
+            eta_str = f"~{self._fmt_time(eta)} remaining"
+        else:
+            eta_str = "estimating..."
+
+        print(f"  Batch {idx}/{n_batches} ({len(batch)} file(s)) "
+              f"[{self._fmt_time(elapsed)} elapsed, {eta_str}] — sending to AI...")
+
+        batch_start = time.monotonic()
+
+        batch_files = [fp for fp, _ in batch]
+        user_msg = self._build_user_message(batch)
+        # The message is the only copy needed from here on — drop the
+        # per-file tuples so contents unique to this batch can be
+        # reclaimed (the read cache may evict them) while we wait on the
+        # network.
+        batch.clear()
+
+        try:
+            est_tokens = (len(prompt) + len(user_msg)) * 2 // 7
+            response = self.client.analyze(prompt, user_msg, est_tokens)
+            findings = response.get("findings", [])
+            summary = response.get("summary", "")
+
+            # Tag every finding with the originating check
+            for f in findings:
+                f.setdefault("check", name)
+
+            batch_time = time.monotonic() - batch_start
+            # One print per result keeps concurrent batches' lines from
+            # interleaving mid-report (each print is a single write).
+            result_line = f"    → {len(findings)} finding(s) ({batch_time:.1f}s)"
+            if summary:
+                result_line += f"\n    AI summary: {summary[:200]}"
+            print(result_line)
+            return findings, batch_files
+
+        except Exception as exc:
+            error_msg = str(exc)
+            print(f"::warning::Batch {idx} of '{name}' failed: {error_msg}")
+
+            # Build a user-friendly description
+            if "401" in error_msg or "403" in error_msg or "authentication" in error_msg.lower() or "unauthorized" in error_msg.lower():
+                friendly = (
+                    f"Authentication failed when calling the AI API. "
+                    f"Your API key is either invalid or missing required permissions. "
+                    f"For GitHub Models, the built-in GITHUB_TOKEN does NOT work — "
+                    f"generate a Personal Access Token (PAT) and store it as a repository secret."
+                )
+            elif "413" in error_msg or "too large" in error_msg.lower() or "tokens_limit" in error_msg.lower():
+                friendly = (
+                    f"Batch {idx} exceeds the model's maximum token limit. "
+                    f"Set 'max-context-tokens' to a value within your model's limit "
+                    f"(e.g. 8000 for GitHub Models gpt-4o, 128000 for OpenAI gpt-4o). "
+                    f"This will split files into smaller batches that fit."
+                )
+            elif "429" in error_msg or "rate-limit" in error_msg.lower():
+                friendly = (
+                    f"Batch {idx} was rate-limited by the AI provider after multiple retries. "
+                    f"Try increasing 'request-delay-ms' (e.g. 500–1000) or reducing the number "
+                    f"of files with 'exclude-patterns' / 'max-file-size-kb'."
+                )
+            elif "timeout" in error_msg.lower():
+                friendly = (
+                    f"Batch {idx} timed out waiting for an AI response. "
+                    f"The batch may contain too many files — try lowering 'max-context-tokens' "
+                    f"to create smaller batches, or check your API endpoint availability."
+                )
+            elif "connection" in error_msg.lower():
+                friendly = (
+                    f"Batch {idx} could not connect to the AI API. "
+                    f"Verify 'api-base-url' is correct and the endpoint is reachable."
+                )
+            else:
+                friendly = f"Batch {idx} failed: {error_msg[:300]}"
+
+            file_list = ", ".join(batch_files[:5])
+            if len(batch_files) > 5:
+                file_list += f" (+{len(batch_files) - 5} more)"
+
+            return [
+                {
+                    "check": name,
+                    "severity": "medium",
+                    "title": f"AI Analysis Failed — Batch {idx}/{n_batches}",
+                    "description": f"{friendly}\n\nAffected files: {file_list}",
+                    "file": batch_files[0] if batch_files else "",
+                    "line": 0,
+                    "category": "analysis-error",
+                    "suggestion": "Re-run with 'debug: true' for full diagnostics. "
+                                   "If rate-limited, add 'request-delay-ms: 1000'.",
+                }
+            ], []
+
+    # ------------------------------------------------------------------
+    # Persistent findings cache (opt-in via cache_dir)
+    # ------------------------------------------------------------------
+
+    def _cache_key(self, prompt: str, content: str) -> str:
+        """Cache key over (model, prompt, content) — any change misses."""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(self.config.get("model", "").encode())
+        h.update(b"\0")
+        h.update(prompt.encode())
+        h.update(b"\0")
+        h.update(content.encode())
+        return h.hexdigest()
+
+    def _cache_lookup(
+        self, cache_dir: str, name: str, prompt: str, files: list[str]
+    ) -> tuple[list[str], list[dict], int]:
+        """Partition *files* into (uncached, cached findings, hit count)."""
+        fresh: list[str] = []
+        cached: list[dict] = []
+        hits = 0
+        for fp in files:
+            content, _ = _read_cached(fp)
+            path = os.path.join(cache_dir, self._cache_key(prompt, content) + ".json")
+            try:
+                with open(path, "r", encoding="utf-8") as fh:
+                    findings = json.load(fh)
+            except (OSError, ValueError):
+                fresh.append(fp)
+                continue
+            # Entries are keyed by content, so an identical file at a new
+            # path hits too — repoint the findings at the current path.
+            for f in findings:
+                f["file"] = fp
+                f.setdefault("check", name)
+            cached.extend(findings)
+            hits += 1
+        return fresh, cached, hits
+
+    def _cache_store(
+        self, cache_dir: str, prompt: str, files: list[str], findings: list[dict]
+    ) -> None:
+        """Write one cache entry per successfully analyzed file."""
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+        except OSError as exc:
+            print(f"::warning::Could not create cache dir '{cache_dir}': {exc}")
+            return
+
+        by_file: dict[str, list[dict]] = {fp: [] for fp in files}
+        for f in findings:
+            fp = f.get("file", "")
+            if fp in by_file:
+                by_file[fp].append(f)
+
+        # Identical contents share a key — keep the richer entry so a
+        # duplicate stub can't overwrite the original's findings.
+        by_key: dict[str, list[dict]] = {}
+        for fp, fl in by_file.items():
+            content, _ = _read_cached(fp)
+            if content.startswith("(error reading file:"):
+                continue
+            key = self._cache_key(prompt, content)
+            if len(fl) >= len(by_key.get(key, [])):
+                by_key[key] = fl
+
+        for key, fl in by_key.items():
+            try:
+                with open(os.path.join(cache_dir, key + ".json"), "w", encoding="utf-8") as fh:
+                    json.dump(fl, fh)
+            except OSError as exc:
+                print(f"::warning::Could not write cache entry: {exc}")
+                return
+
     def _log_throttle_stats(self):
         """Print throttle statistics if any throttling occurred."""
         stats = self.client.stats
@@ -204,35 +525,89 @@ class CheckRunner:
     # Batching
     # ------------------------------------------------------------------
 
-    def _build_batches(self, files: list[str]) -> list[list[tuple[str, str]]]:
-        """Split files into batches that fit the token budget."""
-        max_tokens = self.config.get("max_context_tokens", 100_000)
-        available = int(max_tokens * 0.70)  # leave room for prompt + response
-
-        batches: list[list[tuple[str, str]]] = []
-        current_batch: list[tuple[str, str]] = []
-        current_tokens = 0
-        total = len(files)
+    # File counts above this read through the thread pool
+    _PARALLEL_READ_THRESHOLD = 16
 
-        for i, filepath in enumerate(files, 1):
-            # Progress every 10 files or on last file
-            if i % 10 == 0 or i == total:
-                print(f"    Reading files: {i}/{total} ({len(batches)} batch(es) so far)", end="\r")
+    # Fraction of the context window reserved for the model's response
+    _RESPONSE_RESERVE = 0.25
 
-            content, _ = read_file_content(filepath)
-            tokens = len(content) / _CHARS_PER_TOKEN
+    def _build_batches(self, files: list[str], prompt: str = "") -> list[list[tuple[str, str]]]:
+        """Split files into batches that fit the token budget.
 
-            # If this single file exceeds the budget, it still gets its own batch
-            if current_tokens + tokens > available and current_batch:
-                batches.append(current_batch)
-                current_batch = []
-                current_tokens = 0
-
-            current_batch.append((filepath, content))
-            current_tokens += tokens
+        The budget is the context window minus the measured system-prompt
+        and schema-header sizes and a response reserve — a short prompt no
+        longer forfeits the flat 30% the old heuristic set aside.
+        """
+        max_tokens = self.config.get("max_context_tokens", 100_000)
+        overhead = _estimate_tokens(prompt) + _estimate_tokens(_SCHEMA_PROMPT)
+        available = max_tokens - overhead - int(max_tokens * self._RESPONSE_RESERVE)
+        # An oversized prompt still gets a sliver of budget; the provider
+        # rejects the request with a clear 413-style error if it overflows.
+        available = max(available, max_tokens // 10)
+        total = len(files)
 
-        if current_batch:
-            batches.append(current_batch)
+        # Reads are disk-bound and release the GIL — fan them out, then
+        # pack serially over the prefetched contents.
+        if total > self._PARALLEL_READ_THRESHOLD:
+            with ThreadPoolExecutor(max_workers=8) as ex:
+                contents = list(ex.map(_read_cached, files))
+        else:
+            contents = [_read_cached(p) for p in files]
+
+        # Identical contents (vendored or generated copies) are shipped
+        # once — later copies become a one-line stub pointing back at the
+        # first path, which costs a handful of tokens instead of the body.
+        seen_hash: dict[bytes, int] = {}
+        dup_of: dict[int, int] = {}  # stub index -> index of its original
+        entries: list[tuple[str, str, int]] = []
+        for i, (filepath, (content, tokens)) in enumerate(zip(files, contents)):
+            digest = hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest()
+            orig_i = seen_hash.get(digest)
+            if orig_i is not None:
+                entries.append(
+                    (filepath, _DUP_STUB_PREFIX + files[orig_i], _DUP_STUB_TOKENS)
+                )
+                dup_of[i] = orig_i
+            else:
+                seen_hash[digest] = i
+                entries.append((filepath, content, tokens))
+
+        # First-fit decreasing over the unique contents: place big files
+        # first so small ones can backfill leftover capacity — packs
+        # noticeably fewer batches than input-order packing, and each
+        # batch is one AI round trip. A single file over the budget still
+        # gets a batch of its own.
+        order = sorted(
+            (i for i in range(total) if i not in dup_of),
+            key=lambda i: -entries[i][2],
+        )
+        bins: list[list[int]] = []
+        bin_tokens: list[int] = []
+        for i in order:
+            tokens = entries[i][2]
+            for b, used in enumerate(bin_tokens):
+                if used + tokens <= available:
+                    bins[b].append(i)
+                    bin_tokens[b] = used + tokens
+                    break
+            else:
+                bins.append([i])
+                bin_tokens.append(tokens)
+
+        # Stubs are only meaningful next to the body they reference, so
+        # each rides in its original's bin — a one-line overshoot of the
+        # budget is noise compared to a dangling "identical to" pointer.
+        if dup_of:
+            bin_of = {i: b for b, idxs in enumerate(bins) for i in idxs}
+            for i, orig_i in dup_of.items():
+                b = bin_of[orig_i]
+                bins[b].append(i)
+                bin_tokens[b] += entries[i][2]
+
+        # Restore the original (sorted-path) order within each batch
+        batches = [
+            [(entries[i][0], entries[i][1]) for i in sorted(idxs)] for idxs in bins
+        ]
 
         print(f"    Reading files: {total}/{total} — {len(batches)} batch(es) ready        ")
         return batches
@@ -244,31 +619,20 @@ class CheckRunner:
     @staticmethod
     def _build_user_message(file_batch: list[tuple[str, str]]) -> str:
         """Compose the user-role message containing file contents."""
-        parts = [
-            "Analyze the following source files and report any findings.\n\n",
-            "Respond with a JSON object in this exact schema:\n",
-            "```json\n",
-            '{\n',
-            '  "findings": [\n',
-            '    {\n',
-            '      "file": "relative/path/to/file.ext",\n',
-            '      "line": 42,\n',
-            '      "severity": "high",\n',
-            '      "category": "category-id",\n',
-            '      "title": "Short descriptive title",\n',
-            '      "description": "Detailed description of the issue",\n',
-            '      "suggestion": "How to fix it"\n',
-            '    }\n',
-            '  ],\n',
-            '  "summary": "Brief summary of findings"\n',
-            '}\n',
-            "```\n\n",
-            "Allowed severity values: critical, high, medium, low, info\n",
-            'If no issues are found return: {"findings": [], "summary": "No issues found."}\n\n',
-            "---\n\n",
-        ]
+        # StringIO so each file body is written straight into the buffer —
+        # the per-file f-string used to copy every body a second time
+        # before the final join.
+        buf = io.StringIO()
+        w = buf.write
+        w(_SCHEMA_PROMPT)
 
         for filepath, content in file_batch:
-            parts.append(f"### FILE: {filepath}\n```\n{content}\n```\n\n")
+            if content.startswith(_DUP_STUB_PREFIX):
+                original = content[len(_DUP_STUB_PREFIX):]
+                w(f"### FILE: {filepath} (identical to {original})\n\n")
+            else:
+                w(f"### FILE: {filepath}\n```\n")
+                w(content)
+                w("\n```\n\n")
 
-        return "".join(parts)
+        return buf.getvalue()
@@ -17,32 +17,82 @@ post-step in your workflow.  The webhook destination can also be
 used as a generic integration point for any external system.
 """
 
+import gzip
 import json
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from output_formatter import format_report_stream
+
+try:
+    # Optional accelerator, mirroring output_formatter — returns bytes,
+    # which is exactly what the webhook body needs.
+    import orjson
+
+    def _dumps_bytes(obj) -> bytes:
+        return orjson.dumps(obj, default=str)
+except ImportError:
+    def _dumps_bytes(obj) -> bytes:
+        return json.dumps(obj, default=str).encode("utf-8")
+
+# One keep-alive session for all shippers: the PR-comment call reuses the
+# webhook's TLS handshake when both target the same host, and transient
+# 429/5xx responses retry with backoff inside the adapter.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.5,
+            status_forcelist=[429, 502, 503, 504],
+            allowed_methods=["POST"],
+        )
+    ),
+)
 
 
-def ship_results(report: str, results: list[dict], config: dict) -> str:
+def ship_results(
+    report: str, results: list[dict], config: dict, stats: dict | None = None
+) -> str:
     """Dispatch the report to every configured destination.
 
     Returns the path of the report file if ``file`` is one of the
     destinations, otherwise ``""``.
     """
     destinations = [d.strip() for d in config.get("ship_to", "github-summary").split(",")]
-    report_path = ""
 
-    for dest in destinations:
+    def _dispatch(dest: str) -> str:
         if dest == "github-summary":
             _to_github_summary(report)
         elif dest == "file":
-            report_path = _to_file(report, config)
+            return _to_file(report, results, config, stats)
         elif dest == "webhook":
             _to_webhook(report, results, config)
         elif dest == "github-pr-comment":
             _to_pr_comment(report, config)
         else:
             print(f"::warning::Unknown ship destination '{dest}' — skipped")
+        return ""
+
+    if len(destinations) == 1:
+        return _dispatch(destinations[0])
+
+    # Destinations are independent I/O — fan out so a slow webhook
+    # doesn't stall the summary or file write. Every shipper already
+    # converts its failures to ::warning:: lines instead of raising.
+    report_path = ""
+    with ThreadPoolExecutor(max_workers=len(destinations)) as ex:
+        futures = [(dest, ex.submit(_dispatch, dest)) for dest in destinations]
+        for dest, fut in futures:
+            path = fut.result()
+            if dest == "file":
+                report_path = path
 
     return report_path
 
@@ -56,9 +106,11 @@ def _to_github_summary(report: str) -> None:
     summary_file = os.environ.get("GITHUB_STEP_SUMMARY", "")
     if summary_file:
         try:
-            with open(summary_file, "a", encoding="utf-8") as fh:
-                fh.write(report)
-                fh.write("\n")
+            # Pre-encode and append in one write — reports often run to
+            # hundreds of KB and the default text buffering would split
+            # that into many syscalls.
+            with open(summary_file, "ab") as fh:
+                fh.write(report.encode("utf-8") + b"\n")
             print("  → Shipped to GitHub Actions step summary")
         except OSError as exc:
             print(f"::warning::Could not write step summary: {exc}")
@@ -67,7 +119,9 @@ def _to_github_summary(report: str) -> None:
         print(report)
 
 
-def _to_file(report: str, config: dict) -> str:
+def _to_file(
+    report: str, results: list[dict], config: dict, stats: dict | None = None
+) -> str:
     ext_map = {"markdown": "md", "json": "json", "sarif": "sarif.json"}
     fmt = config.get("output_format", "markdown")
     ext = ext_map.get(fmt, "txt")
@@ -79,37 +133,77 @@ def _to_file(report: str, config: dict) -> str:
     if directory:
         os.makedirs(directory, exist_ok=True)
 
-    with open(file_path, "w", encoding="utf-8") as fh:
-        fh.write(report)
+    if fmt in ("json", "sarif"):
+        # Streamed and sanitized entry-by-entry — never materializes
+        # the whole report in memory (the *report* string may be
+        # empty when 'file' is the only destination).
+        with open(file_path, "w", encoding="utf-8") as fh:
+            format_report_stream(results, config, fh, stats)
+    else:
+        with open(file_path, "wb") as fh:
+            fh.write(report.encode("utf-8"))
 
     print(f"  → Report written to {file_path}")
     return file_path
 
 
+# Webhook bodies above this are worth compressing; small ones skip the CPU
+_GZIP_THRESHOLD_BYTES = 4096
+
+# Per-check findings cap in webhook payloads — receivers get the counts
+# either way, and a runaway check can't balloon the POST body
+_WEBHOOK_MAX_FINDINGS = 500
+
+
 def _to_webhook(report: str, results: list[dict], config: dict) -> None:
     url = config.get("ship_webhook_url", "")
     if not url:
         print("::warning::ship-to includes 'webhook' but ship-webhook-url is empty")
         return
 
+    # One pass: count totals and cap oversized finding lists together
+    total_findings = 0
+    shipped_results = []
+    for r in results:
+        n = len(r["findings"])
+        total_findings += n
+        if n > _WEBHOOK_MAX_FINDINGS:
+            r = {
+                **r,
+                "findings": r["findings"][:_WEBHOOK_MAX_FINDINGS],
+                "findings_truncated": n - _WEBHOOK_MAX_FINDINGS,
+            }
+        shipped_results.append(r)
+
     payload = {
         "source": "pr-guard-ai",
         "repository": os.environ.get("GITHUB_REPOSITORY", ""),
         "ref": os.environ.get("GITHUB_REF", ""),
         "sha": os.environ.get("GITHUB_SHA", ""),
         "run_id": os.environ.get("GITHUB_RUN_ID", ""),
-        "total_findings": sum(len(r["findings"]) for r in results),
-        "results": results,
+        "total_findings": total_findings,
+        "results": shipped_results,
         "report": report[:50_000],  # cap payload size
     }
 
+    # Serialize once; bodies past the threshold ship gzip-compressed —
+    # findings payloads are highly repetitive JSON and shrink 5-10x. The
+    # receiver is an arbitrary endpoint that may not decompress request
+    # bodies, so a rejection is retried with the plain payload.
+    plain = _dumps_bytes(payload)
+    body = plain
+    headers = {"Content-Type": "application/json", "User-Agent": "pr-guard-ai/1.0"}
+    if len(plain) > _GZIP_THRESHOLD_BYTES:
+        body = gzip.compress(plain, compresslevel=1)
+        headers["Content-Encoding"] = "gzip"
+
     try:
-        resp = requests.post(
-            url,
-            json=payload,
-            headers={"Content-Type": "application/json", "User-Agent": "pr-guard-ai/1.0"},
-            timeout=30,
-        )
+        resp = _SESSION.post(url, data=body, headers=headers, timeout=30)
+        if resp.status_code >= 300 and "Content-Encoding" in headers:
+            print(f"    Webhook returned {resp.status_code} for gzipped payload — "
+                  f"retrying uncompressed")
+            del headers["Content-Encoding"]
+            resp = _SESSION.post(url, data=plain, headers=headers, timeout=30)
         if resp.status_code < 300:
             print(f"  → Shipped to webhook ({resp.status_code})")
         else:
@@ -151,7 +245,7 @@ def _to_pr_comment(report: str, config: dict) -> None:
     }
 
     try:
-        resp = requests.post(url, json={"body": body}, headers=headers, timeout=30)
+        resp = _SESSION.post(url, json={"body": body}, headers=headers, timeout=30)
         if resp.status_code < 300:
             print(f"  → Posted PR comment on #{pr_number}")
         else:
@@ -165,13 +259,10 @@ def _to_pr_comment(report: str, config: dict) -> None:
 # ---------------------------------------------------------------------------
 
 
+_PR_RE = re.compile(r"/pull/(\d+)(?:/|$)")
+
+
 def _extract_pr_number() -> str:
     """Extract the pull-request number from GITHUB_REF (``refs/pull/N/merge``)."""
-    ref = os.environ.get("GITHUB_REF", "")
-    if "/pull/" in ref:
-        parts = ref.split("/")
-        try:
-            return parts[parts.index("pull") + 1]
-        except (ValueError, IndexError):
-            pass
-    return ""
+    m = _PR_RE.search(os.environ.get("GITHUB_REF", ""))
+    return m.group(1) if m else ""